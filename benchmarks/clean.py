@@ -0,0 +1,124 @@
+"""Benchmark clean() and clean_many() against the implementation they replaced
+
+Run from the repository root::
+
+    python -m benchmarks.clean [--samples N] [--repeat N]
+
+The outputs of every implementation are compared on a generated corpus
+first, the benchmark fails if any of them differ.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import timeit
+
+from shodan.core.constants import alphabets, normalize_chars
+from shodan.utils.util import clean, clean_many
+
+
+def clean_reference(text: str) -> str:
+    """clean() as it was before the single translate pass, for strings"""
+    unique = [
+        i for i in set(text) if i not in (alphabets() or [""])[0]
+    ]  # handle special chars from other langs
+    chars = normalize_chars()
+    for _char in unique:
+        try:
+            text = text.replace(_char, chars[_char])
+        except KeyError:
+            pass
+    text = re.sub(
+        re.compile(
+            r"[\U00003000\U0000205F\U0000202F\U0000200A\U00002000-\U00002009\U00001680\U000000A0\t]+"  # noqa: E501
+        ),
+        " ",
+        text,
+    )  # handle... interesting spaces
+    text = re.sub(
+        re.compile(r'([.\'"@?!a-z])\1{4,}', re.IGNORECASE), r"\1\1\1", text
+    )  # handle excessive repeats of punctuation, limited to 3
+    text = re.sub(
+        re.compile(r"\s(.+?)\1+\s", re.IGNORECASE), r" \1 ", text
+    )  # handle repeated words
+    text = re.sub(
+        re.compile(r'([\s!?@"\'])\1+'), r"\1", text
+    )  # handle excessive spaces or excessive punctuation
+    text = re.sub(
+        re.compile(r"\s([?.!\"](?:\s|$))"), r"\1", text
+    )  # handle spaces before punctuation but after text
+    text = text.strip().replace("\n", "/n")  # handle newlines
+    text = text.encode("ascii", "ignore").decode()  # remove all non-ascii
+    text = text.strip()  # strip the line
+    return text
+
+
+def corpus(samples: int, seed: int = 2002) -> list[str]:
+    """Chat-like messages mixing styled alphabets, accents, odd spaces and repeats"""
+    rng = random.Random(seed)
+    styled = "".join(alphabets()[1:]) + "".join(normalize_chars())
+    words = ["hello", "shodan", "port", "scan", "nice", "lol", "ok", "the", "a"]
+    spaces = [" ", " ", " ", "\t", " ", " ", "　", "\n", "  "]
+    punctuation = [".", "!", "?", "!!!!!!", "....", '"', "@", "'", "??", " ?"]
+    texts = []
+    for _ in range(samples):
+        parts = []
+        for _ in range(rng.randint(1, 30)):
+            word = rng.choice(words)
+            roll = rng.random()
+            if roll < 0.3:
+                word = "".join(rng.choice(styled) for _ in range(rng.randint(1, 8)))
+            elif roll < 0.4:
+                word = word * rng.randint(2, 4)
+            elif roll < 0.5:
+                word += word[-1] * rng.randint(3, 8)
+            parts.append(word)
+            parts.append(rng.choice(spaces))
+            if rng.random() < 0.2:
+                parts.append(rng.choice(punctuation))
+        texts.append("".join(parts))
+    return texts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = corpus(args.samples)
+    expected = [clean_reference(text) for text in texts]
+    for name, got in (
+        ("clean", [clean(text) for text in texts]),
+        ("clean_many", clean_many(texts)),
+    ):
+        mismatches = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+        if mismatches or len(got) != len(expected):
+            i = mismatches[0] if mismatches else len(got)
+            print(f"{name} differs from the reference on sample {i}:", file=sys.stderr)
+            print(f"  input:     {texts[i]!r}", file=sys.stderr)
+            print(f"  reference: {expected[i]!r}", file=sys.stderr)
+            print(f"  {name}: {got[i] if i < len(got) else None!r}", file=sys.stderr)
+            return 1
+    print(f"Outputs identical on {len(texts)} samples")
+
+    benchmarks = {
+        "reference": lambda: [clean_reference(text) for text in texts],
+        "clean": lambda: [clean(text) for text in texts],
+        "clean_many": lambda: clean_many(texts),
+    }
+    baseline = None
+    for name, run in benchmarks.items():
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(
+            f"{name:<12} {best * 1000:8.2f} ms  "
+            f"{best / len(texts) * 1e6:7.2f} µs/msg  {baseline / best:5.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,24 +3,26 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import io
-import os
 import platform
 from textwrap import dedent, indent
 from traceback import format_exc
 from typing import TYPE_CHECKING
 
+from aiohttp import ClientError, ClientResponseError
 from nextcord import Colour, Embed
 from nextcord import __version__ as dpy_v
-from nextcord.application_command import Interaction, slash_command
-from nextcord.ext.application_checks import bot_has_permissions, is_owner
+from nextcord.application_command import Interaction, SlashOption, slash_command
+from nextcord.ext.application_checks import (
+    bot_has_permissions,
+    has_guild_permissions,
+    is_owner,
+)
 from nextcord.ext.commands import Cog
 
-from shodan.core.paginator import Paginator
+from shodan.core.paginator import LazyEmbeds, Paginator
 from shodan.utils import logging
-from shodan.utils.checks import has_guild_permissions
-from shodan.utils.json import upsert_json
 from shodan.utils.modules import close, restart
-from shodan.utils.util import clean_code
+from shodan.utils.util import Raise, clean_code
 
 if TYPE_CHECKING:
     from shodan.core.bot import MainBot
@@ -34,16 +36,80 @@ class Developer(Cog):
     def __init__(self, bot: MainBot):
         self.bot = bot
 
+    async def _can_manage(self, inter: Interaction, shared: bool) -> bool:
+        """Whether the user may manage the keys picked, tells them if not"""
+        if shared and not await self.bot.is_owner(inter.user):
+            await Raise(inter, "Only the bot owner can manage shared keys").error()
+            return False
+        return True
+
     @slash_command(name="setkey")
     @has_guild_permissions(manage_guild=True)
-    async def set_api_key(self, inter: Interaction, key: str):
-        """Set Shodan API key
+    async def set_api_key(self, inter: Interaction, key: str, shared: bool = False):
+        """Add a Shodan API key
         :param inter:
         :parameter key: Shodan API key
+        :parameter shared: Share the key with every server (owner only)
         """
-        os.environ["SHODAN_KEY"] = key
-        self.bot.get_cog("Member")._shodan_key = key
-        await inter.send(f"Shodan API key set to ||`{key}`||", ephemeral=True)
+        if not await self._can_manage(inter, shared):
+            return
+        guild = None if shared else inter.guild_id
+        await inter.response.defer(ephemeral=True)
+        try:
+            info = await self.bot.shodan.info(key)
+        except ClientResponseError as e:
+            return await inter.send(
+                f"Shodan rejected the key: `{e.message}`", ephemeral=True
+            )
+        except (asyncio.TimeoutError, ClientError) as e:
+            return await inter.send(
+                f"Couldn't reach the Shodan API to check the key: `{e!r}`",
+                ephemeral=True,
+            )
+        self.bot.keys.add(key, guild).update(info)
+        await inter.send(
+            f"Shodan API key ||`{key}`|| added to the "
+            f"{'shared' if guild is None else 'server'} keys, "
+            f"`{info.get('query_credits')}` query credit(s) left",
+            ephemeral=True,
+        )
+
+    @slash_command(name="removekey")
+    @has_guild_permissions(manage_guild=True)
+    async def remove_api_key(self, inter: Interaction, key: str, shared: bool = False):
+        """Remove a Shodan API key
+        :param inter:
+        :parameter key: Shodan API key
+        :parameter shared: Remove the key from the shared keys (owner only)
+        """
+        if not await self._can_manage(inter, shared):
+            return
+        guild = None if shared else inter.guild_id
+        if not self.bot.keys.remove(key, guild):
+            return await inter.send("That key isn't set", ephemeral=True)
+        await inter.send("Shodan API key removed", ephemeral=True)
+
+    @slash_command(name="keys")
+    @has_guild_permissions(manage_guild=True)
+    async def list_api_keys(self, inter: Interaction):
+        """The Shodan API keys searches in this server are spread across"""
+        lane = self.bot.keys.lane(inter.guild_id)
+        keys = self.bot.keys.keys(lane)
+        if not keys:
+            return await inter.send("No Shodan API key is set", ephemeral=True)
+        lines = [
+            f"`{key.masked}` {key.plan or '-'} • credits `{key.credits}` • "
+            f"requests `{key.requests}`" + ("" if key.healthy else " • ⚠️ rejected")
+            for key in keys
+        ]
+        await inter.send(
+            embed=Embed(
+                color=Colour.random(),
+                title="__Shodan API keys__",
+                description="\n".join(lines),
+            ).set_footer(text="Shared keys" if lane is None else "Server keys"),
+            ephemeral=True,
+        )
 
     @slash_command()
     async def restart(self, inter: Interaction):
@@ -56,8 +122,8 @@ class Developer(Cog):
         )
         msg = await msg.fetch()
 
-        upsert_json(
-            {"restart_msg": msg.id, "restart_channel": msg.channel.id}, "config"
+        self.bot.config["config"].update(
+            {"restart.message": msg.id, "restart.channel": msg.channel.id}
         )
         asyncio.create_task(restart(self.bot))
 
@@ -68,23 +134,88 @@ class Developer(Cog):
         Return total task count running in background in the bot.
         Use for tracking the load on the bot
         """
-        tasks = asyncio.all_tasks()
-        filtered_task = [task for task in tasks if not task.done()]
+        gauges = self.bot.metrics.snapshot()
+        latency, rss = gauges["gateway_latency"], gauges["rss"]
+        latency = "-" if latency is None else f"{latency * 1000:.0f}ms"
+        rss = "-" if rss is None else f"{rss / 1024**2:.1f} MiB"
         await inter.send(
             embed=Embed(
                 color=Colour.random(),
                 title="__Background Tasks__",
                 description=dedent(
                     f"""\
-                > **Total scheduled tasks: `{len(tasks)}`**
+                > **Running tasks: `{gauges['tasks']}`**
+
+                > **Open paginators: `{gauges['open_views']}`**
+
+                > **Commands served: `{gauges['commands']}`**
+
+                > **Gateway latency: `{latency}`**
+
+                > **Memory: `{rss}`**
+                """
+                ),
+            ),
+            ephemeral=True,
+        )
+
+    @slash_command(name="cache")
+    @is_owner()
+    async def cache_stats(
+        self,
+        inter: Interaction,
+        action: str = SlashOption(choices=["stats", "flush"], default="stats"),
+    ):
+        """Inspect or flush the Shodan response cache
+        :param inter:
+        :parameter action: Show the cache statistics or flush every entry
+        """
+        cache = self.bot.cache
+        if action == "flush":
+            return await inter.send(
+                f"Flushed `{cache.clear()}` cached response(s)", ephemeral=True
+            )
+        cache.expire()
+        await inter.send(
+            embed=Embed(
+                color=Colour.random(),
+                title="__Response Cache__",
+                description=dedent(
+                    f"""\
+                > **Entries: `{len(cache)}`**
 
-                > **Current running tasks in background: `{len(filtered_task)}`**
+                > **Size: `{cache.size / 1024:.1f}/{cache.max_bytes / 1024:.0f} KiB`**
+
+                > **Hits/Misses: `{cache.hits}/{cache.misses}` (`{cache.hit_ratio:.0%}`)**
+
+                > **Evictions: `{cache.evictions}`** | **TTL: `{cache.ttl:.0f}s`**
                 """
                 ),
             ),
             ephemeral=True,
         )
 
+    @slash_command(name="apistats")
+    @is_owner()
+    async def api_stats(self, inter: Interaction):
+        """Latency and status codes of the Shodan API endpoints"""
+        em = Embed(color=Colour.random(), title="__Shodan API__")
+        for endpoint, stats in self.bot.shodan.latency.items():
+            statuses = ", ".join(
+                f"{status}×{count}" for status, count in sorted(stats.statuses.items())
+            )
+            em.add_field(
+                name=endpoint.capitalize(),
+                value=dedent(
+                    f"""\
+                    > Requests: `{stats.requests}`
+                    > Mean: `{stats.mean * 1000:.0f}ms`
+                    > P95: `{stats.percentile(95) * 1000:.0f}ms`
+                    > Statuses: `{statuses or '-'}`"""
+                ),
+            )
+        await inter.send(embed=em, ephemeral=True)
+
     @slash_command(
         name="logout",
         description="Disconnect the bot from discord",
@@ -131,15 +262,15 @@ class Developer(Cog):
                 result = f"{stdout.getvalue()}\n-- {obj}\n"
         except (Exception, SyntaxError):
             result = "".join(format_exc())
-        pages = [result[i : i + 2000] for i in range(0, len(result), 2000)]
-        em = []
-        for index, page in enumerate(pages):
-            em.append(
-                Embed(
-                    color=Colour.random(), description=f"```py\n{page}\n```"
-                ).set_footer(text=f"Page {index}/{len(pages)}")
-            )
-        await Paginator(inter, em).start()
+        pages = -(-len(result) // 2000)
+
+        def render(index: int) -> Embed:
+            page = result[index * 2000 : (index + 1) * 2000]
+            return Embed(
+                color=Colour.random(), description=f"```py\n{page}\n```"
+            ).set_footer(text=f"Page {index}/{pages}")
+
+        await Paginator(inter, LazyEmbeds(pages, render)).start()
 
     @slash_command(name="botstats")
     @has_guild_permissions(manage_guild=True)
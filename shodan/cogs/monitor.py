@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+from json import JSONDecodeError
+from time import time
+from typing import TYPE_CHECKING
+
+from aiohttp import ClientError
+from nextcord import ChannelType, Colour, Embed, HTTPException, TextChannel
+from nextcord.application_command import Interaction, Range, SlashOption, slash_command
+from nextcord.ext.application_checks import has_guild_permissions
+from nextcord.ext.commands import Cog
+
+from shodan.core.monitor import Delta, SavedSearch
+from shodan.core.ratelimit import Priority
+from shodan.utils.logging import get_logger
+from shodan.utils.util import Raise, code_block
+
+if TYPE_CHECKING:
+    from shodan.core.bot import MainBot
+
+logger = get_logger(__name__)
+
+MAX_PER_GUILD = 10
+DELTA_LINES = 20
+
+
+class Monitor(Cog):
+    """Saved searches re-run in the background"""
+
+    def __init__(self, bot: MainBot):
+        self.bot = bot
+        self.searches: dict[tuple[int, int], SavedSearch] = {}
+        self.config = bot.config["monitors"]
+        for data in self.config.data or []:
+            search = SavedSearch.from_dict(data)
+            self.searches[search.guild, search.id] = search
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def cog_unload(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def save(self) -> None:
+        self.config.replace([search.to_dict() for search in self.searches.values()])
+
+    @Cog.listener()
+    async def on_ready(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._run_due()
+            except Exception:
+                # One bad round mustn't end monitoring until the next on_ready
+                logger.exception("Checking saved searches failed")
+            wait = min(
+                (s.next_run for s in self.searches.values()), default=time() + 300
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=min(max(wait - time(), 1), 300)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_due(self) -> None:
+        if due := [search for search in self.searches.values() if search.due]:
+            for search in due:
+                search.schedule()
+            # Background priority, so interactive searches go first
+            results = await asyncio.gather(
+                *(self._check(search) for search in due), return_exceptions=True
+            )
+            for search, result in zip(due, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        "Saved search %s failed", search.query, exc_info=result
+                    )
+            self.save()
+
+    async def _check(self, search: SavedSearch) -> None:
+        try:
+            results = await self.bot.shodan.search(
+                search.query,
+                minify=True,
+                fresh=True,
+                guild=search.guild,
+                user=f"monitor-{search.id}",
+                priority=Priority.BACKGROUND,
+            )
+        except (ClientError, asyncio.TimeoutError, JSONDecodeError, LookupError) as e:
+            return logger.warning(
+                "Saved search %s failed: %s", search.query, str(e) or type(e).__name__
+            )
+
+        first = not search.runs
+        delta = search.diff(results["matches"])
+        if not first and not delta:
+            return
+        channel = self.bot.get_channel(search.channel)
+        if channel is None:
+            return logger.warning("Channel of saved search %s is gone", search.query)
+        try:
+            await channel.send(embed=self.render(search, delta, first))
+        except HTTPException as e:
+            logger.warning("Posting saved search %s failed: %s", search.query, e)
+
+    @staticmethod
+    def render(search: SavedSearch, delta: Delta, first: bool) -> Embed:
+        lines = [
+            f"{sign} {match.ip_str}:{match.port}".ljust(26) + (match.org or "")
+            for sign, matches in (("+", delta.new), ("~", delta.changed))
+            for match in matches
+        ]
+        if len(lines) > DELTA_LINES:
+            lines = lines[:DELTA_LINES] + [f"… and {len(lines) - DELTA_LINES} more"]
+        title = (
+            f"🛰 Watching {len(delta)} host(s)"
+            if first
+            else f"🛰 {len(delta.new)} new, {len(delta.changed)} changed host(s)"
+        )
+        return Embed(
+            color=Colour.brand_red(),
+            title=title,
+            description=code_block("\n".join(lines) or "No results", "diff"),
+        ).set_footer(text=f"#{search.id} • {search.query}"[:2048])
+
+    @slash_command()
+    async def monitor(self, inter: Interaction):
+        pass
+
+    @monitor.subcommand()
+    @has_guild_permissions(manage_guild=True)
+    async def add(
+        self,
+        inter: Interaction,
+        query: str,
+        hours: Range[1, 168] = 24,
+        channel: TextChannel = SlashOption(
+            channel_types=[ChannelType.text], required=False
+        ),
+    ):
+        """Re-run a search on an interval and post the hosts that are new or changed
+
+        Parameters
+        ----------
+        inter:
+        query: str
+            Shodan search query
+        hours: Optional[int]
+            Hours between runs
+        channel: Optional[TextChannel]
+            Where to post the changes, defaults to this channel
+        """
+        ids = [id for guild, id in self.searches if guild == inter.guild_id]
+        if len(ids) >= MAX_PER_GUILD:
+            return await Raise(
+                inter, f"A server can have up to {MAX_PER_GUILD} saved searches"
+            ).error()
+        search = SavedSearch(
+            max(ids, default=0) + 1,
+            inter.guild_id,
+            (channel or inter.channel).id,
+            query,
+            hours * 3600,
+        )
+        self.searches[search.guild, search.id] = search
+        self.save()
+        self._wakeup.set()
+        await inter.send(
+            f"Saved search `#{search.id}` runs every `{hours}` hour(s) "
+            f"in <#{search.channel}>",
+            ephemeral=True,
+        )
+
+    @monitor.subcommand(name="list")
+    async def list_(self, inter: Interaction):
+        """The saved searches of this server"""
+        searches = [s for s in self.searches.values() if s.guild == inter.guild_id]
+        if not searches:
+            return await Raise(inter, "No saved searches").error()
+        await inter.send(
+            embed=Embed(
+                color=Colour.brand_red(),
+                title="🛰 Saved searches",
+                description="\n".join(
+                    f"`#{s.id}` `{s.query}` every `{s.interval / 3600:g}h` in "
+                    f"<#{s.channel}>, next <t:{int(s.next_run)}:R>"
+                    for s in searches
+                ),
+            ),
+            ephemeral=True,
+        )
+
+    @monitor.subcommand()
+    @has_guild_permissions(manage_guild=True)
+    async def remove(self, inter: Interaction, id: int):
+        """Stop re-running a saved search
+
+        Parameters
+        ----------
+        inter:
+        id: int
+            The number of the saved search
+        """
+        if self.searches.pop((inter.guild_id, id), None) is None:
+            return await Raise(inter, f"No saved search `#{id}`").error()
+        self.save()
+        await inter.send(f"Saved search `#{id}` removed", ephemeral=True)
+
+
+def setup(bot: MainBot):
+    bot.add_cog(Monitor(bot))
@@ -1,39 +1,77 @@
 from __future__ import annotations
 
-import io
-from datetime import datetime
+import asyncio
 from json import JSONDecodeError
 from os import getenv
+from pathlib import Path
+from time import perf_counter
 from typing import TYPE_CHECKING
 
-from aiohttp import ClientResponseError
-from nextcord import Colour, Embed, File, Forbidden, ui
+from aiohttp import ClientError, ClientResponseError
+from nextcord import Colour, Embed, File, Forbidden
 from nextcord.application_command import (
     ApplicationCommandType,
     Interaction,
     Range,
+    SlashOption,
     slash_command,
 )
 from nextcord.ext.commands import Cog
 
-from shodan.core.paginator import PaginatorView
-from shodan.core.views import Vulnerability
+from shodan.core.export import FORMATS, ExportWriter
+from shodan.core.facets import FIELDS
+from shodan.core.index import parse_asn
+from shodan.core.paginator import LazyEmbeds, Paginator
+from shodan.core.views import SearchView, facet_embed
 from shodan.utils.logging import get_logger
-from shodan.utils.util import Raise, code_block
+from shodan.utils.util import Raise, code_block, parse_port
 
 if TYPE_CHECKING:
     from shodan.core.bot import MainBot
 
 logger = get_logger(__name__)
 
+KNOWN_PER_PAGE = 20
+MAX_DEEP_PAGES = 10
+
+
+def unreachable(error: Exception) -> str:
+    """What to tell the user when Shodan couldn't be reached in time"""
+    if isinstance(error, asyncio.TimeoutError):
+        return "Shodan API took too long to respond, try again later"
+    return f"Couldn't reach the Shodan API: `{error}`"
+
+
+def group_parts(parts: list[Path], limit: int) -> list[list[Path]]:
+    """Group files so no message goes over ``limit`` bytes or 10 attachments"""
+    groups: list[list[Path]] = []
+    size = 0
+    for path in parts:
+        part = path.stat().st_size
+        if not groups or len(groups[-1]) == 10 or size + part > limit:
+            groups.append([])
+            size = 0
+        groups[-1].append(path)
+        size += part
+    return groups
+
+
+def parse_range(value: str, parse) -> tuple[int, int] | None:
+    """``"80"`` becomes ``(80, 80)`` and ``"80-443"`` becomes ``(80, 443)``"""
+    first, _, last = value.partition("-")
+    first, last = parse(first), parse(last or first)
+    if first is None or last is None:
+        return None
+    return (first, last) if first <= last else (last, first)
+
 
 class Other(Cog):
     """Commands related to members"""
 
     def __init__(self, bot: MainBot):
         self.bot = bot
-        self.session = bot.session
-        self._shodan_key = getenv("SHODAN_KEY")
+        self.shodan = bot.shodan
+        self._prefetch_budget = int(getenv("PREFETCH_BUDGET", 2))
 
     @slash_command()
     async def ping(self, inter: Interaction):
@@ -46,7 +84,10 @@ class Other(Cog):
         inter: Interaction,
         query: str,
         facets: str = None,
-        page: Range[1, 100] = 1,
+        page: Range[1, 100] = None,
+        banners: bool = True,
+        results: bool = None,
+        last_page: Range[1, 100] = None,
     ):
         """Do Shodan search
 
@@ -59,14 +100,27 @@ class Other(Cog):
             A comma-separated list of properties to get summary information on
         page: Optional[int]
             The page number to page through results 100 at a time
+        banners: Optional[bool]
+            Attach the raw banner and HTML of each result
+        results: Optional[bool]
+            Show the matching hosts, by default only the total and facets are
+            shown when you ask for facets without a page
+        last_page: Optional[int]
+            Also fetch every page up to this one while you look at the first
         """
-        if not self._shodan_key:
-            cmd = self.bot.get_application_command_from_signature(
-                "setkey", ApplicationCommandType.chat_input, inter.guild_id
-            )
+        if results is None:
+            # Facets without a page only need the count endpoint, which
+            # doesn't cost query credits
+            results = not facets or page is not None or last_page is not None
+        if not results:
+            return await self._count(inter, query, facets)
+        page = page or 1
+        if not await self._has_key(inter):
+            return
+        last_page = max(last_page or page, page)
+        if last_page - page >= MAX_DEEP_PAGES:
             return await Raise(
-                inter,
-                f"First set SHODAN_API_KEY via {cmd.get_mention(inter.guild)} command",  # noqa
+                inter, f"A search can fetch up to {MAX_DEEP_PAGES} pages at once"
             ).error()
 
         msg = await inter.send(
@@ -76,150 +130,293 @@ class Other(Cog):
             ),
         )
 
+        async def on_queued(position: int):
+            await msg.edit(
+                embed=Embed(
+                    color=Colour.brand_red(),
+                    description=f"***⏳Queued, `{position}` search(es) ahead of you...***",
+                ),
+            )
+
+        # The deeper pages are queued right behind the first one and fetched
+        # concurrently, the first page is shown as soon as it lands
+        first = asyncio.create_task(
+            self.shodan.search(
+                query,
+                facets,
+                page,
+                minify=not banners,
+                guild=inter.guild_id,
+                user=inter.user.id,
+                on_queued=on_queued,
+            )
+        )
+        deep: list[asyncio.Task] = [
+            asyncio.create_task(
+                self.shodan.search(
+                    query,
+                    facets,
+                    deeper,
+                    minify=not banners,
+                    guild=inter.guild_id,
+                    user=inter.user.id,
+                )
+            )
+            for deeper in range(page + 1, last_page + 1)
+        ]
         try:
-            perms = {"key": self._shodan_key, "query": query, "page": page}
-            if facets:
-                perms["facets"] = facets
-            results = await self.session.get(
-                "https://api.shodan.io/shodan/host/search",
-                params=perms,
+            try:
+                results = await first
+            except JSONDecodeError:
+                error = "Invalid JSON response from Shodan API"
+            except Forbidden as e:
+                error = f"[Status-{e.status}] {e.text}"
+            except ClientResponseError as e:
+                error = f"[Status-{e.status}]  {e.message}"
+            except (asyncio.TimeoutError, ClientError) as e:
+                error = unreachable(e)
+            else:
+                error = None if results["matches"] else "No results found"
+            if error is not None:
+                return await Raise(inter, error, edit=msg).error()
+
+            view = SearchView(
+                inter.user,
+                self.shodan,
+                results,
+                query=query,
+                facets=facets,
+                page=page,
+                guild=inter.guild_id,
+                budget=self._prefetch_budget,
+                minify=not banners,
+            )
+            view.msg = msg
+            view.interaction = inter
+
+            await view.button_callback(None)
+            if deep:
+                view.stream(deep)
+                deep = []
+        finally:
+            # Whatever wasn't handed to the view must not outlive the command
+            for task in deep:
+                task.cancel()
+
+    @slash_command()
+    async def count(self, inter: Interaction, query: str, facets: str = None):
+        """Count the results of a Shodan search without using query credits
+
+        Parameters
+        ----------
+        inter:
+        query: str
+            Shodan search query
+        facets: Optional[str]
+            A comma-separated list of properties to get summary information on
+        """
+        await self._count(inter, query, facets)
+
+    async def _count(self, inter: Interaction, query: str, facets: str | None):
+        if not await self._has_key(inter):
+            return
+
+        msg = await inter.send(
+            embed=Embed(
+                color=Colour.brand_red(),
+                description="***⏳Counting...***",
+            ),
+        )
+        try:
+            results = await self.shodan.count(
+                query, facets, guild=inter.guild_id, user=inter.user.id
             )
-            results = await results.json()
         except JSONDecodeError:
             return await Raise(
                 inter, "Invalid JSON response from Shodan API", edit=msg
             ).error()
-        except Forbidden as e:
-            return await Raise(inter, f"[Status-{e.status}] {e.text}", edit=msg).error()
         except ClientResponseError as e:
             return await Raise(
                 inter, f"[Status-{e.status}]  {e.message}", edit=msg
             ).error()
+        except (asyncio.TimeoutError, ClientError) as e:
+            return await Raise(inter, unreachable(e), edit=msg).error()
 
-        if not results["matches"]:
-            return await Raise(inter, "No results found", edit=msg).error()
-
-        embeds = []
-        for match in results["matches"]:
-            embed = (
-                Embed(
-                    title=match["org"],
-                    color=Colour.random(seed=match["ip_str"]),
-                    url=f"https://www.shodan.io/host/{match['ip_str']}",
-                    timestamp=datetime.fromisoformat(match["timestamp"])
-                    if match["timestamp"]
-                    else None,
-                )
-                .add_field(
-                    name="🌐 IP-Address",
-                    value=code_block(f"{match['ip_str']}:{match['port']}", "rb"),
-                    inline=False,
-                )
-                .set_author(
-                    name=f"Location: {match['location']['city']}, {match['location']['country_name']}",
-                    url=f"https://www.google.com/maps/search/"
-                    f"{match['location']['latitude']},{match['location']['longitude']}",
-                    icon_url="https://cdn-icons-png.flaticon.com/512/2875/2875433.png",
-                )
-                .set_footer(text=f"Total Pages: {results['total']}")
-            )
+        await msg.edit(
+            embed=facet_embed(query, results.get("total", 0), results.get("facets", {}))
+        )
 
-            if match["hostnames"]:
-                embed.add_field(
-                    name="📛 Hostnames",
-                    value=code_block("\n".join(match["hostnames"]), "py"),
-                    inline=False,
-                )
+    async def _has_key(self, inter: Interaction) -> bool:
+        if self.shodan.keys.available(inter.guild_id):
+            return True
+        cmd = self.bot.get_application_command_from_signature(
+            "setkey", ApplicationCommandType.chat_input, inter.guild_id
+        )
+        await Raise(
+            inter,
+            f"First set SHODAN_API_KEY via {cmd.get_mention(inter.guild)} command",
+        ).error()
+        return False
 
-            embeds.append(embed)
+    @slash_command()
+    async def top(
+        self,
+        inter: Interaction,
+        facet: str = SlashOption(choices=list(FIELDS), default="org"),
+        amount: Range[1, 25] = 10,
+    ):
+        """The most common values across every search result looked at today
 
-        view = PaginatorView(inter.user, embeds)
-        vulnerability = Vulnerability()
-        view.add_item(vulnerability)
+        Parameters
+        ----------
+        inter:
+        facet: Optional[str]
+            The property to count
+        amount: Optional[int]
+            How many values to show
+        """
+        top = self.bot.facets.top(facet, amount)
+        if not top:
+            return await Raise(inter, "No search results looked at today").error()
 
-        async def vulnerability_callback(interaction: Interaction):
-            """Callback for vulnerability button"""
-            await interaction.send(
-                embed=Embed(description="***⏳Searching...***"), ephemeral=True
-            )
-            ems = []
-            for cve, data in results["matches"][view.index]["vulns"].items():
-                ems.append(
-                    Embed(
-                        title=cve,
-                        color=Colour.random(seed=cve),
-                        description=data["summary"],
-                        url=data["references"][0],
-                    )
-                    .add_field(
-                        name="🎚 CVSS",
-                        value=code_block(data["cvss"]),
-                    )
-                    .add_field(
-                        name="Verified",
-                        value=code_block(data["verified"]),
-                    )
-                )
-            vuln_view = PaginatorView(interaction.user, ems)
+        width = max(len(value) for value, _ in top)
+        await inter.send(
+            embed=Embed(
+                color=Colour.brand_red(),
+                title=f"📊 Top {facet} today",
+                description=code_block(
+                    "\n".join(
+                        f"{value.ljust(width)}  {count:,}" for value, count in top
+                    ),
+                    "py",
+                ),
+            ).set_footer(text=f"Across {len(self.bot.facets):,} host(s)")
+        )
 
-            async def _callback(_):
-                for item in vuln_view.children:
-                    if isinstance(item, ui.Button) and item.custom_id == "page_count":
-                        item.label = f"Page {vuln_view.index + 1}/{len(ems)}"
+    @slash_command()
+    async def export(
+        self,
+        inter: Interaction,
+        query: str,
+        fmt: str = SlashOption(name="format", choices=list(FORMATS), default="ndjson"),
+        pages: Range[1, 20] = 5,
+    ):
+        """Export the results of a search as gzip-compressed NDJSON or CSV
 
-                await interaction.edit_original_message(
-                    embed=ems[vuln_view.index], view=vuln_view
-                )
+        Parameters
+        ----------
+        inter:
+        query: str
+            Shodan search query
+        fmt: Optional[str]
+            The file format
+        pages: Optional[int]
+            How many pages of 100 results to export, each costs a query credit
+        """
+        if not await self._has_key(inter):
+            return
 
-            vuln_view.button_callback = _callback
-
-            await _callback(None)
-
-        vulnerability.callback = vulnerability_callback
-
-        async def button_callback(_):
-            match_result = results["matches"][view.index]
-            for item in view.children:
-                item: ui.Button
-                if item.custom_id == "page_count":
-                    item.label = f"Page {view.index + 1}/{len(view.embeds)}"
-                if item.custom_id == "search-vulnerabilities":
-                    if "vulns" in match_result and match_result["vulns"]:
-                        item.disabled = False
-                    else:
-                        item.disabled = True
-
-            if "http" in results["matches"][view.index]:
-                headers = io.BytesIO(
-                    results["matches"][view.index]["data"]
-                    .split("\r\n\r\n")[0]
-                    .encode("utf-8")
+        msg = await inter.send(
+            embed=Embed(color=Colour.brand_red(), description="***⏳Exporting...***")
+        )
+        limit = inter.guild.filesize_limit if inter.guild else 8 * 1024**2
+        writer = ExportWriter(f"shodan-{inter.id}", fmt, limit=limit)
+        try:
+            async for results in self.shodan.pages(
+                query, 1, pages, guild=inter.guild_id, user=inter.user.id
+            ):
+                # Compressing a page is a few milliseconds of CPU, keep it off the loop
+                await self.bot.loop.run_in_executor(
+                    None, writer.write, results.get("matches", ())
                 )
-                files = [File(fp=headers, filename="headers.txt")]
-                if "html" in match_result["http"]:
-                    files.append(
-                        File(
-                            fp=io.BytesIO(match_result["http"]["html"].encode("utf-8")),
-                            filename="page.html",
-                        )
-                    )
-            elif "data" in results["matches"][view.index]:
-                files = [
-                    File(
-                        fp=io.BytesIO(
-                            results["matches"][view.index]["data"].encode("utf-8")
-                        ),
-                        filename="data.txt",
+                await msg.edit(
+                    embed=Embed(
+                        color=Colour.brand_red(),
+                        description=f"***⏳Exported `{writer.rows}` result(s)...***",
                     )
-                ]
-            else:
-                files = None
-            await view.msg.edit(embed=embeds[view.index], view=view, files=files)
+                )
+            parts = await self.bot.loop.run_in_executor(None, writer.close)
+            if not parts:
+                return await Raise(inter, "No results found", edit=msg).error()
+
+            await msg.edit(
+                embed=Embed(
+                    color=Colour.brand_red(),
+                    description=f"***✅Exported `{writer.rows}` result(s) "
+                    f"in `{len(parts)}` file(s)***",
+                )
+            )
+            # The size limit applies to a whole message, not to every file, and
+            # writer.limit leaves room for the multipart overhead
+            for group in group_parts(parts, writer.limit):
+                await inter.channel.send(files=[File(path) for path in group])
+        except JSONDecodeError:
+            return await Raise(
+                inter, "Invalid JSON response from Shodan API", edit=msg
+            ).error()
+        except ClientResponseError as e:
+            return await Raise(
+                inter, f"[Status-{e.status}]  {e.message}", edit=msg
+            ).error()
+        except (asyncio.TimeoutError, ClientError) as e:
+            return await Raise(inter, unreachable(e), edit=msg).error()
+        finally:
+            writer.cleanup()
+
+    @slash_command()
+    async def known(
+        self,
+        inter: Interaction,
+        cidr: str = None,
+        port: str = None,
+        asn: str = None,
+    ):
+        """Look up hosts from earlier searches without using query credits
+
+        Parameters
+        ----------
+        inter:
+        cidr: Optional[str]
+            An IP range like 8.8.0.0/16
+        port: Optional[str]
+            A port or a port range like 8000-8100
+        asn: Optional[str]
+            An ASN or an ASN range like AS15169 or AS1-AS2000
+        """
+        ports = asns = None
+        if port is not None and (ports := parse_range(port, parse_port)) is None:
+            return await Raise(inter, f"`{port}` isn't a port or a port range").error()
+        if asn is not None and (asns := parse_range(asn, parse_asn)) is None:
+            return await Raise(inter, f"`{asn}` isn't an ASN or an ASN range").error()
 
-        view.button_callback = button_callback
-        view.msg = msg
+        start = perf_counter()
+        try:
+            hosts = self.bot.hosts.query(cidr=cidr, ports=ports, asns=asns)
+        except ValueError:
+            return await Raise(inter, f"`{cidr}` isn't a valid CIDR range").error()
+        elapsed = (perf_counter() - start) * 1_000_000
+
+        if not hosts:
+            return await Raise(inter, "No known hosts found").error()
+
+        pages = -(-len(hosts) // KNOWN_PER_PAGE)
+
+        def render(index: int) -> Embed:
+            lines = [
+                f"{host.ip_str}:{host.port}".ljust(28)
+                + (f"AS{host.asn} " if host.asn is not None else "")
+                + (host.org or "")
+                for host in hosts[index * KNOWN_PER_PAGE : (index + 1) * KNOWN_PER_PAGE]
+            ]
+            return Embed(
+                color=Colour.brand_red(),
+                title="Known hosts",
+                description="```\n" + "\n".join(lines) + "\n```",
+            ).set_footer(
+                text=f"{len(hosts)} host(s) • {elapsed:.0f}µs • Page {index + 1}/{pages}"
+            )
 
-        await button_callback(None)
+        await Paginator(inter, LazyEmbeds(pages, render)).start()
 
 
 def setup(bot: MainBot):
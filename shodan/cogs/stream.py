@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+from nextcord import ChannelType, Colour, Embed, TextChannel
+from nextcord.application_command import Interaction, SlashOption, slash_command
+from nextcord.ext.application_checks import has_guild_permissions, is_owner
+from nextcord.ext.commands import Cog
+
+from shodan.core.stream import StreamConsumer, Subscription
+from shodan.utils.logging import get_logger
+from shodan.utils.util import Raise, code_block, parse_port
+
+if TYPE_CHECKING:
+    from shodan.core.bot import MainBot
+
+logger = get_logger(__name__)
+
+
+class Stream(Cog):
+    """Real-time banners from the Shodan stream"""
+
+    def __init__(self, bot: MainBot):
+        self.bot = bot
+        self.consumer = StreamConsumer(
+            bot.session,
+            os.getenv("SHODAN_STREAM_URL", "https://stream.shodan.io/shodan/banners"),
+            key=self._key,
+            post=self.post,
+            queue_size=int(os.getenv("STREAM_QUEUE_SIZE", 100)),
+            batch=int(os.getenv("STREAM_BATCH", 10)),
+        )
+        self.config = bot.config["streams"]
+        self._subscriptions = self.config.data or []
+
+    def _key(self) -> str | None:
+        return next((key.key for key in self.bot.keys.keys() if key.healthy), None)
+
+    def cog_unload(self) -> None:
+        self.consumer.close()
+
+    def save(self) -> None:
+        self.config.replace(
+            [sub.to_dict() for sub in self.consumer.subscriptions.values()]
+        )
+
+    @Cog.listener()
+    async def on_ready(self):
+        for data in self._subscriptions:
+            self.consumer.subscribe(Subscription.from_dict(data))
+        self._subscriptions = []
+        if self.consumer.subscriptions:
+            self.consumer.start()
+
+    async def post(self, channel_id: int, banners: list[dict]) -> None:
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return
+        lines = [
+            f"{banner.get('ip_str')}:{banner.get('port')}".ljust(26)
+            + f"{(banner.get('location') or {}).get('country_code') or '--'} "
+            + (banner.get("org") or "")
+            for banner in banners
+        ]
+        await channel.send(
+            embed=Embed(
+                color=Colour.brand_red(),
+                title=f"📡 {len(banners)} new banner(s)",
+                description=code_block("\n".join(lines), "py", limit=4096),
+            )
+        )
+
+    @slash_command()
+    async def stream(self, inter: Interaction):
+        pass
+
+    @stream.subcommand()
+    @has_guild_permissions(manage_guild=True)
+    async def subscribe(
+        self,
+        inter: Interaction,
+        ports: str = None,
+        countries: str = None,
+        text: str = None,
+        channel: TextChannel = SlashOption(
+            channel_types=[ChannelType.text], required=False
+        ),
+    ):
+        """Post banners from the Shodan stream as they're found
+
+        Parameters
+        ----------
+        inter:
+        ports: Optional[str]
+            A comma-separated list of ports
+        countries: Optional[str]
+            A comma-separated list of country codes like US,DE
+        text: Optional[str]
+            Text the organization or a hostname has to contain
+        channel: Optional[TextChannel]
+            Where to post the banners, defaults to this channel
+        """
+        port_list = [parse_port(port) for port in (ports or "").split(",") if port]
+        if None in port_list:
+            return await Raise(inter, f"`{ports}` isn't a list of ports").error()
+        if self._key() is None:
+            return await Raise(
+                inter, "The stream needs a shared Shodan API key and none is set"
+            ).error()
+        subscription = Subscription(
+            inter.guild_id,
+            (channel or inter.channel).id,
+            ports=port_list,
+            countries=[c.strip() for c in (countries or "").split(",") if c.strip()],
+            text=text,
+        )
+        self.consumer.subscribe(subscription)
+        self.consumer.start()
+        self.save()
+        await inter.send(
+            f"Streaming banners to <#{subscription.channel}>", ephemeral=True
+        )
+
+    @stream.subcommand()
+    @has_guild_permissions(manage_guild=True)
+    async def unsubscribe(
+        self,
+        inter: Interaction,
+        channel: TextChannel = SlashOption(
+            channel_types=[ChannelType.text], required=False
+        ),
+    ):
+        """Stop posting stream banners to a channel
+
+        Parameters
+        ----------
+        inter:
+        channel: Optional[TextChannel]
+            The channel to stop posting to, defaults to this channel
+        """
+        channel_id = (channel or inter.channel).id
+        subscription = self.consumer.subscriptions.get(channel_id)
+        if subscription is None or subscription.guild != inter.guild_id:
+            return await Raise(inter, "That channel isn't subscribed").error()
+        self.consumer.unsubscribe(channel_id)
+        if not self.consumer.subscriptions:
+            self.consumer.close()
+        self.save()
+        await inter.send(f"Stopped streaming to <#{channel_id}>", ephemeral=True)
+
+    @stream.subcommand()
+    @is_owner()
+    async def stats(self, inter: Interaction):
+        """Throughput of the Shodan stream consumer"""
+        consumer = self.consumer
+        await inter.send(
+            embed=Embed(
+                color=Colour.random(),
+                title="__Shodan Stream__",
+                description=dedent(
+                    f"""\
+                > **Running: `{consumer.running}`, reconnects: `{consumer.reconnects}`**
+
+                > **Received: `{consumer.received}` (`{consumer.throughput:.1f}/s`, `{consumer.bytes / 1024:.0f} KiB`)**
+
+                > **Matched/Dropped: `{consumer.matched}/{consumer.dropped}`**
+
+                > **Posted: `{consumer.posted}` in `{consumer.batches}` message(s)**
+
+                > **Subscriptions: `{len(consumer.subscriptions)}`**
+                """  # noqa: E501
+                ),
+            ),
+            ephemeral=True,
+        )
+
+
+def setup(bot: MainBot):
+    bot.add_cog(Stream(bot))
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from collections import Counter, deque
+from time import perf_counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, NamedTuple
+
+from aiohttp import ClientResponseError, ClientSession, ClientTimeout, TCPConnector
+
+from shodan.utils import logging
+
+from .blobs import BlobStore
+from .cache import ResponseCache, SingleFlight
+from .keys import ApiKey, KeyPool
+from .metrics import Histogram
+from .models import Match
+from .ratelimit import Priority
+from .store import ResultStore
+
+__all__ = ["ShodanClient", "LatencyStats", "Endpoint", "ENDPOINTS"]
+
+logger = logging.get_logger(__name__)
+
+BASE_URL = "https://api.shodan.io"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class Endpoint(NamedTuple):
+    path: str
+    timeout: ClientTimeout
+
+
+ENDPOINTS = {
+    "search": Endpoint("/shodan/host/search", ClientTimeout(total=30, connect=5)),
+    "count": Endpoint("/shodan/host/count", ClientTimeout(total=15, connect=5)),
+    "host": Endpoint("/shodan/host/{ip}", ClientTimeout(total=15, connect=5)),
+    "info": Endpoint("/api-info", ClientTimeout(total=10, connect=5)),
+}
+
+
+class LatencyStats:
+    r"""Rolling latency samples and status code counts of one endpoint
+
+    Every request is also counted into a :class:`Histogram` for the metrics.
+    """
+    __slots__ = ("samples", "requests", "statuses", "histogram")
+
+    def __init__(self, size: int = 512):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.requests = 0
+        self.statuses: Counter[int] = Counter()
+        self.histogram = Histogram()
+
+    def add(self, seconds: float, status: int) -> None:
+        self.samples.append(seconds)
+        self.requests += 1
+        self.statuses[status] += 1
+        self.histogram.observe(seconds)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def percentile(self, percent: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class ShodanClient:
+    r"""The Shodan REST API client shared by every cog
+
+    Every request is paced by the :class:`KeyPool` lane of its guild, identical
+    concurrent requests share one call and cacheable responses are served from
+    the :class:`ResponseCache`. Failed requests with a 5xx or 429 status are
+    retried with a jittered exponential backoff.
+
+    Parameters
+    ----------
+    keys: :class:`KeyPool`
+        The Shodan API keys requests are spread across
+    cache: :class:`ResponseCache`
+        Where search and count responses are cached
+    blobs: :class:`BlobStore`
+        Where the banners and HTML bodies of the matches are spilled to
+    store: Optional[:class:`ResultStore`]
+        Where search responses are persisted across restarts
+    retries: :class:`int`
+        How many times a failed request is retried
+    """
+
+    def __init__(
+        self,
+        keys: KeyPool,
+        *,
+        cache: ResponseCache,
+        blobs: BlobStore,
+        store: ResultStore | None = None,
+        retries: int = 3,
+        connections: int = 10,
+    ):
+        self.keys = keys
+        self.cache = cache
+        self.blobs = blobs
+        self.store = store
+        self.retries = retries
+        self.connections = connections
+        self.latency: dict[str, LatencyStats] = {
+            name: LatencyStats() for name in ENDPOINTS
+        }
+        self.on_ingest: list[Callable[[list[Match]], Any]] = []
+        self._inflight = SingleFlight()
+        self._session: ClientSession | None = None
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                BASE_URL,
+                connector=TCPConnector(
+                    limit=self.connections,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                    enable_cleanup_closed=True,
+                ),
+                headers={"Accept-Encoding": "gzip, deflate"},
+                raise_for_status=False,
+                trust_env=True,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def search(
+        self,
+        query: str,
+        facets: str | None = None,
+        page: int = 1,
+        *,
+        minify: bool = False,
+        fresh: bool = False,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_queued: Callable[[int], Awaitable[Any]] | None = None,
+    ) -> dict:
+        """Search Shodan using the same query syntax as the website
+
+        The matches of the response are parsed into :class:`Match` records.
+        Pass ``minify`` when the full banners aren't needed and ``fresh`` to
+        skip cached and stored responses.
+        """
+        params = {"query": query, "page": page}
+        if facets:
+            params["facets"] = facets
+        if minify:
+            params["minify"] = "true"
+        return await self._request(
+            "search",
+            params,
+            cache_key=("search", *self.cache.make_key(query, facets, page), minify),
+            parse=self._parse_search,
+            persist=True,
+            fresh=fresh,
+            guild=guild,
+            user=user,
+            priority=priority,
+            on_queued=on_queued,
+        )
+
+    async def count(
+        self,
+        query: str,
+        facets: str | None = None,
+        *,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_queued: Callable[[int], Awaitable[Any]] | None = None,
+    ) -> dict:
+        """Total results and facets of a search, without spending query credits"""
+        params = {"query": query}
+        if facets:
+            params["facets"] = facets
+        return await self._request(
+            "count",
+            params,
+            cache_key=("count", *self.cache.make_key(query, facets)[:2]),
+            guild=guild,
+            user=user,
+            priority=priority,
+            on_queued=on_queued,
+        )
+
+    async def pages(
+        self,
+        query: str,
+        first: int = 1,
+        last: int = 1,
+        *,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> AsyncIterator[dict]:
+        """Raw search responses of a page range, fetched one page at a time
+
+        The responses skip the cache, the store and match parsing, so walking
+        any amount of pages holds only one of them in memory.
+        """
+        for page in range(first, last + 1):
+            results = await self._request(
+                "search",
+                {"query": query, "page": page},
+                guild=guild,
+                user=user,
+                priority=priority,
+            )
+            yield results
+            if page * 100 >= results.get("total", 0):
+                break
+
+    async def host(
+        self,
+        ip: str,
+        *,
+        history: bool = False,
+        minify: bool = False,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> dict:
+        """All services that have been found on the given host IP"""
+        return await self._request(
+            "host",
+            {"history": str(history).lower(), "minify": str(minify).lower()},
+            path_args={"ip": ip},
+            cache_key=("host", ip, history, minify),
+            guild=guild,
+            user=user,
+            priority=priority,
+        )
+
+    async def info(self, key: ApiKey | str | None = None) -> dict:
+        """Plan, query credits and scan credits of an API key
+
+        Pass ``key`` to ask about a specific key, its credit balance is
+        updated from the response.
+        """
+        if key is None:
+            return await self._request("info", {})
+        if isinstance(key, str):
+            key = ApiKey(key, self.keys.rate)
+        await key.wait()
+        info, _ = await self._fetch("info", {}, None, key.key)
+        key.update(info)
+        return info
+
+    async def refresh(self) -> None:
+        """Update the credit balance of every key in the pool"""
+        for _, key in self.keys:
+            try:
+                await self.info(key)
+            except ClientResponseError as e:
+                logger.warning("Key %s was rejected: %s", key.masked, e.message)
+                key.disable(self.keys.COOLDOWN)
+
+    async def _request(
+        self,
+        endpoint: str,
+        params: dict,
+        *,
+        path_args: dict | None = None,
+        cache_key: Hashable | None = None,
+        parse: Callable[[dict], Awaitable[tuple[dict, int]]] | None = None,
+        persist: bool = False,
+        fresh: bool = False,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_queued: Callable[[int], Awaitable[Any]] | None = None,
+    ) -> dict:
+        if cache_key is not None and not fresh:
+            results = self.cache.get(cache_key)
+            if results is not None:
+                return results
+
+        persist = persist and cache_key is not None and self.store is not None
+
+        async def call() -> dict:
+            stored = persist and not fresh
+            results = await self.store.load_search(cache_key) if stored else None
+            if results is not None:
+                size = 0
+            else:
+                results, size = await self._schedule(
+                    endpoint, params, path_args, guild, user, priority, on_queued
+                )
+                if persist and "error" not in results:
+                    self.store.save_search(cache_key, results)
+            if parse is not None:
+                results, size = await parse(results)
+            if cache_key is not None and "error" not in results:
+                self.cache.set(cache_key, results, size)
+            return results
+
+        # Identical requests running at the same time share one call
+        if cache_key is None:
+            flight = (endpoint, object())
+        else:
+            flight = ("fresh", cache_key) if fresh else cache_key
+        return await self._inflight.do(flight, call)
+
+    async def _parse_search(self, results: dict) -> tuple[dict, int]:
+        """Prune the matches at ingest so the raw banners aren't kept around
+
+        Building the matches writes their banners and bodies to the blob
+        store, so it runs in the default executor.
+        """
+        matches = await asyncio.get_running_loop().run_in_executor(
+            None, self._matches, results.get("matches", ())
+        )
+        for listener in self.on_ingest:
+            listener(matches)
+        results = {
+            "matches": matches,
+            "total": results.get("total", 0),
+            "facets": results.get("facets", {}),
+        }
+        return results, sum(match.size for match in matches) + 1024
+
+    def _matches(self, matches: list[dict]) -> list[Match]:
+        return [Match(match, self.blobs) for match in matches]
+
+    async def _schedule(
+        self,
+        endpoint: str,
+        params: dict,
+        path_args: dict | None,
+        guild: Hashable,
+        user: Hashable,
+        priority: Priority,
+        on_queued: Callable[[int], Awaitable[Any]] | None,
+    ) -> tuple[dict, int]:
+        attempt = 0
+        scheduler = self.keys.scheduler(guild)
+        # Searches with filters or past the first page cost a query credit
+        credits = int(
+            endpoint == "search"
+            and (params.get("page", 1) > 1 or ":" in params.get("query", ""))
+        )
+        while True:
+            ticket = scheduler.submit(
+                lambda: self._call(endpoint, params, path_args, guild, credits),
+                guild=guild,
+                user=user,
+                priority=priority,
+            )
+            if on_queued and (position := scheduler.position(ticket)):
+                await on_queued(position)
+            try:
+                return await ticket
+            except ClientResponseError as e:
+                # A rejected key is benched, another one may still work
+                rejected = e.status == 401 and any(
+                    key.healthy for key in self.keys.keys(guild)
+                )
+                if (
+                    e.status not in RETRY_STATUSES and not rejected
+                ) or attempt >= self.retries:
+                    raise
+                # Full jitter keeps retries from lining up into a new burst
+                delay = random.uniform(0, min(30.0, 2.0**attempt))
+                if e.status == 429:
+                    scheduler.bucket.pause(delay)
+                logger.warning(
+                    "Shodan %s returned %s, retrying in %.1fs",
+                    endpoint,
+                    e.status,
+                    delay,
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _call(
+        self,
+        endpoint: str,
+        params: dict,
+        path_args: dict | None,
+        guild: Hashable,
+        credits: int,
+    ) -> tuple[dict, int]:
+        key = await self.keys.acquire(guild, credits=credits)
+        try:
+            results = await self._fetch(endpoint, params, path_args, key.key)
+        except ClientResponseError as e:
+            if e.status == 401:
+                logger.warning("Key %s was rejected: %s", key.masked, e.message)
+                key.disable(self.keys.COOLDOWN)
+            elif e.status == 429:
+                key.bucket.pause(1)
+            raise
+        key.spend(credits)
+        return results
+
+    async def _fetch(
+        self, endpoint: str, params: dict, path_args: dict | None, key: str
+    ) -> tuple[dict, int]:
+        path, timeout = ENDPOINTS[endpoint]
+        if path_args:
+            path = path.format(**path_args)
+        started = perf_counter()
+        async with self.session.get(
+            path, params={"key": key, **params}, timeout=timeout
+        ) as response:
+            body = await response.read()
+        self.latency[endpoint].add(perf_counter() - started, response.status)
+
+        if response.status >= 400:
+            try:
+                message = json.loads(body)["error"]
+            except (ValueError, KeyError, TypeError):
+                message = response.reason or "Unknown error"
+            raise ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=message,
+                headers=response.headers,
+            )
+        return json.loads(body), len(body)
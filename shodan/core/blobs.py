@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from shodan.utils import logging
+
+__all__ = ["BlobStore"]
+
+logger = logging.get_logger(__name__)
+
+
+class BlobStore:
+    r"""A size-capped, disk-backed store for banners and HTML bodies
+
+    Blobs are written once to a temporary directory under their content hash,
+    read back through memory maps and evicted least recently used first once
+    their total size exceeds ``max_bytes``. Blobs are put from worker
+    threads, so the bookkeeping is locked and a blob is written under a
+    temporary name and renamed, it's never seen half written.
+
+    Parameters
+    ----------
+    max_bytes: :class:`int`
+        Upper bound for the summed size of the stored blobs
+    directory: Optional[:class:`str`]
+        Where to keep the blobs, defaults to a new temporary directory
+    """
+    __slots__ = ("directory", "max_bytes", "size", "evictions", "_blobs", "_lock")
+
+    def __init__(self, *, max_bytes: int = 256 * 1024 * 1024, directory: str = None):
+        self.directory = Path(directory or tempfile.mkdtemp(prefix="shodan-blobs-"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._blobs: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._blobs
+
+    def put(self, data: str | bytes) -> str:
+        """Store ``data`` unless an identical blob is already stored and return its key"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            if key in self._blobs:
+                self._blobs.move_to_end(key)
+                return key
+        if len(data) > self.max_bytes:
+            logger.warning("Blob of %s bytes is bigger than the store", len(data))
+            return key
+
+        fd, tmp = tempfile.mkstemp(prefix=f".{key}.", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp, self.directory / key)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            if key not in self._blobs:
+                self._blobs[key] = len(data)
+                self.size += len(data)
+            while self.size > self.max_bytes:
+                self._evict(next(iter(self._blobs)))
+        return key
+
+    def _size(self, key: str) -> int | None:
+        with self._lock:
+            if key not in self._blobs:
+                return None
+            self._blobs.move_to_end(key)
+            return self._blobs[key]
+
+    def path(self, key: str) -> Path | None:
+        """The file holding the blob, ``None`` once it has been evicted"""
+        if self._size(key) is None:
+            return None
+        return self.directory / key
+
+    def open(self, key: str) -> mmap.mmap | None:
+        """Memory map the blob for reading, the caller has to close it"""
+        if not self._size(key):
+            return None
+        try:
+            with open(self.directory / key, "rb") as file:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:  # Evicted since
+            return None
+
+    def read(self, key: str) -> bytes | None:
+        if (size := self._size(key)) is None:
+            return None
+        if not size:
+            return b""
+        view = self.open(key)
+        if view is None:
+            return None
+        with view:
+            return view[:]
+
+    def gzip(self, key: str, *, limit: int | None = None) -> str | None:
+        """Store a gzip-compressed copy of the first ``limit`` bytes of a blob"""
+        view = self.open(key)
+        if view is None:
+            return None
+        with view:
+            return self.put(gzip.compress(view[:limit], compresslevel=6))
+
+    def _evict(self, key: str) -> None:
+        self.size -= self._blobs.pop(key)
+        self.evictions += 1
+        (self.directory / key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._blobs):
+                self._evict(key)
+
+    def close(self) -> None:
+        """Remove every blob along with the directory"""
+        with self._lock:
+            self._blobs.clear()
+            self.size = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
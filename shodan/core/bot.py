@@ -22,7 +22,16 @@ from shodan.utils.keep_alive import webserver
 
 from ..events._helper import after_cmd_invoke
 from ..utils import logging
+from ..utils.config import ConfigStore
 from ..utils.modules import load_cogs, load_events, post_restart
+from .api import ShodanClient
+from .blobs import BlobStore
+from .cache import ResponseCache
+from .facets import FacetAggregator
+from .index import HostIndex
+from .keys import KeyPool
+from .metrics import Metrics
+from .store import ResultStore
 
 ROOT_DIR = str(Path(__file__).parents[1])
 logger = logging.get_logger(__name__)
@@ -46,8 +55,37 @@ class BaseMainBot(Bot):
         self.test: bool = os.getenv("TEST", "False").lower() in ("1", "true", "T")
         self.guild: Guild | None = None
         self.session = aiohttp.ClientSession(trust_env=True)
+        self.cache = ResponseCache(
+            ttl=float(os.getenv("CACHE_TTL", 600)),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+        )
+        self.config = ConfigStore(delay=float(os.getenv("CONFIG_FLUSH_DELAY", 1)))
+        self.keys = KeyPool(
+            rate=float(os.getenv("SHODAN_RATE", 1)),
+            shared=filter(None, os.getenv("SHODAN_KEY", "").split(",")),
+            config=self.config["keys"],
+        )
+        self.blobs = BlobStore(
+            max_bytes=int(os.getenv("BLOB_MAX_BYTES", 256 * 1024 * 1024))
+        )
+        self.store = ResultStore(
+            os.getenv("STORE_PATH", ROOT_DIR + "/assets/shodan.db"),
+            ttl=float(os.getenv("STORE_TTL", 3600)),
+        )
+        self.shodan = ShodanClient(
+            self.keys,
+            cache=self.cache,
+            blobs=self.blobs,
+            store=self.store,
+            connections=int(os.getenv("SHODAN_CONNECTIONS", 10)),
+        )
+        self.hosts = HostIndex()
+        self.shodan.on_ingest.append(self.hosts.add)
+        self.facets = FacetAggregator()
+        self.shodan.on_ingest.append(self.facets.add)
+        self.metrics = Metrics(self)
         self.after_invoke(after_cmd_invoke)
-        webserver()
+        webserver(int(os.getenv("PORT", 8080)), self.metrics)
 
     @property
     def member(self):
@@ -58,6 +96,10 @@ class BaseMainBot(Bot):
         """Called when the bot is ready."""
         await self.wait_until_ready()
         await post_restart(self)
+        if not len(self.hosts):
+            self.hosts.extend(await self.loop.run_in_executor(None, self.store.hosts))
+            logger.info("Indexed %s known host(s)", len(self.hosts))
+            self.loop.create_task(self.shodan.refresh())
 
         logger.line()
         logger.info("Nextcord.py: v%s", dpy_v)
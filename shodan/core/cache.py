@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, TypeVar
+
+__all__ = ["ResponseCache", "CacheEntry", "SingleFlight"]
+
+T = TypeVar("T")
+
+
+class CacheEntry(NamedTuple):
+    expires: float
+    size: int
+    value: Any
+
+
+class ResponseCache:
+    r"""An in-process TTL cache with LRU eviction bounded by the total size of its entries
+
+    Parameters
+    ----------
+    ttl: :class:`float`
+        Seconds an entry stays fresh after it was stored
+    max_bytes: :class:`int`
+        Upper bound for the summed ``size`` of every entry in the cache
+    """
+    __slots__ = ("ttl", "max_bytes", "hits", "misses", "evictions", "_entries", "_size")
+
+    def __init__(self, *, ttl: float = 600, max_bytes: int = 32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def make_key(
+        query: str, facets: str | None = None, page: int = 1
+    ) -> tuple[str, tuple[str, ...], int]:
+        """Normalize the search arguments so equivalent searches share one entry"""
+        facets = tuple(
+            sorted({f.strip().lower() for f in (facets or "").split(",") if f.strip()})
+        )
+        return " ".join(query.split()), facets, int(page)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires > monotonic()
+
+    @property
+    def size(self) -> int:
+        """Approximate amount of bytes held by the cache"""
+        return self._size
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value for ``key`` and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry.expires <= monotonic():
+            self._pop(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, size: int) -> None:
+        """Store ``value`` under ``key``. Values bigger than the whole cache are ignored"""
+        if key in self._entries:
+            self._pop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = CacheEntry(monotonic() + self.ttl, size, value)
+        self._size += size
+        while self._size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _pop(self, key: Hashable) -> None:
+        self._size -= self._entries.pop(key).size
+
+    def expire(self) -> int:
+        """Drop every stale entry and return how many were removed"""
+        now = monotonic()
+        stale = [key for key, entry in self._entries.items() if entry.expires <= now]
+        for key in stale:
+            self._pop(key)
+        return len(stale)
+
+    def clear(self) -> int:
+        """Flush the cache and return how many entries were removed"""
+        count = len(self._entries)
+        self._entries.clear()
+        self._size = 0
+        return count
+
+
+class SingleFlight:
+    r"""Coalesce concurrent calls that share a key into a single in-flight task
+
+    Every caller awaiting the same key while the first call is running gets the
+    same result (or exception) instead of starting its own call. The call is
+    cancelled once every caller waiting on it has been cancelled.
+    """
+    __slots__ = ("calls", "shared", "_flights", "_waiters")
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await the in-flight call for ``key`` or start one with ``factory``"""
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = asyncio.ensure_future(factory())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.shared += 1
+        self._waiters[flight] = self._waiters.get(flight, 0) + 1
+        try:
+            # Shielded so one caller giving up doesn't cancel the call for the others
+            return await asyncio.shield(flight)
+        finally:
+            self._leave(key, flight)
+
+    def _leave(self, key: Hashable, flight: asyncio.Future) -> None:
+        waiters = self._waiters.pop(flight) - 1
+        if waiters:
+            self._waiters[flight] = waiters
+        elif not flight.done():
+            # Nobody wants the result anymore, a new caller starts over
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.cancel()
+
+    def _forget(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # Mark as retrieved when every caller went away
@@ -1,6 +1,32 @@
-from urllib.request import urlopen
+from __future__ import annotations
 
-NORMALIZE_CHARS = {
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from shodan.utils import logging
+
+__all__ = [
+    "alphabets",
+    "normalize_chars",
+    "translate_table",
+    "maps_ascii",
+]
+
+logger = logging.get_logger(__name__)
+
+# Styled alphabets in the format of clean-discord by JEF1056,
+# https://github.com/JEF1056/clean-discord, shipped with the package
+ALPHABETS_FILE = Path(__file__).parents[1] / "assets" / "alphabets.txt"
+CACHE_DIR = Path(
+    os.getenv("SHODAN_CACHE_DIR")
+    or Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "shodan"
+)
+
+# Accented letters, the alphabets file adds the styled ones on top
+_ACCENTED = {
     "Š": "S",
     "š": "s",
     "Ð": "Dj",
@@ -77,21 +103,85 @@ NORMALIZE_CHARS = {
     "Ș": "S",
     "Ț": "T",
 }
-ALPHABETS = (
-    urlopen(
-        "https://raw.githubusercontent.com/JEF1056/clean-discord/master/src/alphabets.txt"
-    )
-    .read()
-    .decode("utf-8")
-    .strip()
-    .split("\n")
-)
-for alphabet in ALPHABETS[1:]:
-    alphabet = alphabet
-    for ind, char in enumerate(alphabet):
-        try:
-            NORMALIZE_CHARS[char] = ALPHABETS[0][ind]
-        except KeyError:
-            print(alphabet, len(alphabet), len(ALPHABETS[0]))
-            break
-NORMALIZE_CHARS = dict(NORMALIZE_CHARS)
+
+
+@lru_cache(maxsize=None)
+def alphabets() -> list[str]:
+    """The alphabets of ``assets/alphabets.txt``
+
+    The first line is the plain alphabet, every other line a styled one in
+    the same order. Each styled character normalizes to the plain one at its
+    index.
+    """
+    try:
+        text = ALPHABETS_FILE.read_text("utf-8")
+    except OSError as e:
+        logger.error(
+            "Couldn't read the alphabets file, styled text isn't cleaned: %s", e
+        )
+        return []
+    return [line for line in text.strip().split("\n") if not line.startswith("#")]
+
+
+@lru_cache(maxsize=None)
+def normalize_chars() -> dict[str, str]:
+    """The replacement of every character :func:`clean` normalizes"""
+    chars = dict(_ACCENTED)
+    lines = alphabets()
+    for alphabet in lines[1:]:
+        chars.update(zip(alphabet, lines[0]))
+    return chars
+
+
+def _cache_path() -> Path:
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("\n".join(alphabets()).encode())
+    digest.update(json.dumps(_ACCENTED, sort_keys=True).encode())
+    return CACHE_DIR / f"translate-{digest.hexdigest()}.json"
+
+
+@lru_cache(maxsize=None)
+def translate_table() -> dict[int, str]:
+    """:meth:`str.translate` table replacing every character outside the plain
+    alphabet that has a normalized form
+
+    Built on first use and cached on disk, keyed by the content of the tables.
+    """
+    path = _cache_path()
+    try:
+        return {int(k): v for k, v in json.loads(path.read_text("utf-8")).items()}
+    except (OSError, ValueError):
+        pass
+
+    plain = set(alphabets()[0]) if alphabets() else set()
+    table = {
+        ord(char): replacement
+        for char, replacement in normalize_chars().items()
+        if char not in plain
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(table), "utf-8")
+        tmp.replace(path)
+    except OSError as e:
+        logger.debug("Couldn't cache the translate table: %s", e)
+    return table
+
+
+@lru_cache(maxsize=None)
+def maps_ascii() -> bool:
+    """Whether any ASCII character has a normalized form, text that's plain
+    ASCII can skip the translation otherwise"""
+    return any(code < 128 for code in translate_table())
+
+
+def __getattr__(name: str):
+    # Built lazily, importing the module doesn't pay for the tables
+    if name == "ALPHABETS":
+        return alphabets()
+    if name == "NORMALIZE_CHARS":
+        return normalize_chars()
+    if name == "TRANSLATE_TABLE":
+        return translate_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import sys
+from weakref import WeakValueDictionary
+
+__all__ = ["CVE", "CVEStore", "CVES"]
+
+
+class CVE:
+    r"""A vulnerability as reported by Shodan, shared by every host that has it
+
+    Parameters
+    ----------
+    id: :class:`str`
+        The CVE identifier
+    data: :class:`dict`
+        The vulnerability of a decoded match
+    """
+    __slots__ = ("id", "summary", "cvss", "reference", "__weakref__")
+
+    def __init__(self, id: str, data: dict):
+        self.id = sys.intern(id)
+        self.summary: str | None = data.get("summary")
+        self.cvss: float | None = data.get("cvss")
+        self.reference: str | None = (data.get("references") or [None])[0]
+
+    @property
+    def score(self) -> float:
+        """The CVSS score, unscored vulnerabilities sort last"""
+        return -1.0 if self.cvss is None else float(self.cvss)
+
+    def __repr__(self) -> str:
+        return f"<CVE id={self.id!r} cvss={self.cvss}>"
+
+
+class CVEStore:
+    r"""Interns vulnerabilities so each CVE is kept in memory once
+
+    Records are weakly referenced, a CVE is dropped once no match refers to
+    it anymore.
+    """
+    __slots__ = ("hits", "_records")
+
+    def __init__(self):
+        self.hits = 0
+        self._records: WeakValueDictionary[str, CVE] = WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._records
+
+    def get(self, id: str) -> CVE | None:
+        return self._records.get(id)
+
+    def intern(self, id: str, data: dict) -> CVE:
+        """The shared record of ``id``, created from ``data`` on first sight"""
+        cve = self._records.get(id)
+        if cve is None:
+            # Matches are built in worker threads, the first record stored wins
+            cve = self._records.setdefault(id, CVE(id, data))
+        else:
+            self.hits += 1
+        return cve
+
+
+# Shared by every match of the process
+CVES = CVEStore()
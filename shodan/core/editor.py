@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from shodan.utils import logging
+
+from .ratelimit import TokenBucket
+
+__all__ = ["MessageEditor", "channel_bucket"]
+
+logger = logging.get_logger(__name__)
+
+# Discord allows roughly 5 message edits per 5 seconds on a channel's route
+_channel_buckets: dict[int, TokenBucket] = {}
+
+
+def channel_bucket(channel_id: int) -> TokenBucket:
+    """The edit rate limit shared by every message of a channel"""
+    bucket = _channel_buckets.get(channel_id)
+    if bucket is None:
+        bucket = _channel_buckets[channel_id] = TokenBucket(rate=1, capacity=5)
+    return bucket
+
+
+class MessageEditor:
+    r"""Coalesces the edits of one message
+
+    Only the most recently scheduled edit is sent, edits scheduled while another
+    one is in flight or waiting for the rate limit replace each other. An edit
+    is a callable, so it reads the view's state when it's actually sent.
+
+    Parameters
+    ----------
+    bucket: Optional[:class:`TokenBucket`]
+        The rate limit of the message's route, defaults to one for this message
+    """
+    __slots__ = ("bucket", "sent", "dropped", "_pending", "_waiters", "_task")
+
+    def __init__(self, bucket: TokenBucket | None = None):
+        self.bucket = bucket or TokenBucket(rate=1, capacity=5)
+        self.sent = 0
+        self.dropped = 0
+        self._pending: Callable[[], Awaitable[Any]] | None = None
+        self._waiters: list[asyncio.Future] = []
+        self._task: asyncio.Task | None = None
+
+    def schedule(self, edit: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue ``edit`` in place of any edit that hasn't been sent yet
+
+        The returned future resolves with the result of the edit that was sent
+        for it, which may be a later one.
+        """
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = edit
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return waiter
+
+    async def _run(self) -> None:
+        while self._pending is not None:
+            if delay := self.bucket.delay():
+                await asyncio.sleep(delay)
+                continue
+            edit, waiters = self._pending, self._waiters
+            self._pending, self._waiters = None, []
+            self.bucket.consume()
+            try:
+                result = await edit()
+            except Exception as e:
+                logger.error("Editing the message failed: %s", e)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                        waiter.exception()
+            else:
+                self.sent += 1
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(result)
+
+    def cancel(self) -> None:
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
+        for waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import IO, Iterable
+
+__all__ = ["ExportWriter", "CSV_FIELDS", "FORMATS"]
+
+FORMATS = ("ndjson", "csv")
+
+CSV_FIELDS = (
+    "ip_str",
+    "port",
+    "transport",
+    "org",
+    "isp",
+    "asn",
+    "hostnames",
+    "country_code",
+    "city",
+    "product",
+    "version",
+    "vulns",
+    "timestamp",
+)
+
+
+def _row(match: dict) -> dict:
+    location = match.get("location") or {}
+    return {
+        **{field: match.get(field) for field in CSV_FIELDS},
+        "hostnames": " ".join(match.get("hostnames") or ()),
+        "country_code": location.get("country_code"),
+        "city": location.get("city"),
+        "vulns": " ".join(match.get("vulns") or ()),
+    }
+
+
+class ExportWriter:
+    r"""Writes matches to gzip-compressed NDJSON or CSV files as they arrive
+
+    Only the page being written is held in memory. Once a file's compressed
+    size gets close to ``limit`` it's closed and the next one is started, so
+    every part fits in a single upload.
+
+    Parameters
+    ----------
+    name: :class:`str`
+        The file name the parts are named after
+    fmt: :class:`str`
+        ``ndjson`` or ``csv``
+    limit: :class:`int`
+        Maximum size of a part in bytes
+    """
+
+    # Room for what zlib still holds back when the limit is checked
+    MARGIN = 256 * 1024
+
+    def __init__(self, name: str, fmt: str = "ndjson", *, limit: int = 8 * 1024**2):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}")
+        self.name = name
+        self.fmt = fmt
+        self.limit = max(limit - self.MARGIN, self.MARGIN)
+        self.directory = Path(tempfile.mkdtemp(prefix="shodan-export-"))
+        self.parts: list[Path] = []
+        self.rows = 0
+        self._raw: IO[bytes] | None = None
+        self._text: io.TextIOWrapper | None = None
+        self._csv: csv.DictWriter | None = None
+
+    def __enter__(self) -> ExportWriter:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _open(self) -> None:
+        path = self.directory / f"{self.name}-{len(self.parts) + 1}.{self.fmt}.gz"
+        self.parts.append(path)
+        self._raw = open(path, "wb")
+        self._text = io.TextIOWrapper(
+            gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6),
+            encoding="utf-8",
+            newline="",
+        )
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(
+                self._text, CSV_FIELDS, extrasaction="ignore", lineterminator="\n"
+            )
+            self._csv.writeheader()
+
+    def _finish(self) -> None:
+        if self._text is not None:
+            self._text.close()  # Closes the gzip stream, not the raw file
+            self._raw.close()
+            self._text = self._raw = self._csv = None
+
+    def write(self, matches: Iterable[dict]) -> int:
+        """Append a page of matches, returns how many were written"""
+        written = 0
+        for match in matches:
+            if self._text is None:
+                self._open()
+            if self.fmt == "csv":
+                self._csv.writerow(_row(match))
+            else:
+                self._text.write(json.dumps(match, separators=(",", ":")))
+                self._text.write("\n")
+            written += 1
+            if self._raw.tell() >= self.limit:
+                self._finish()
+        self.rows += written
+        return written
+
+    def close(self) -> list[Path]:
+        """Finish the last part and return every part"""
+        self._finish()
+        return self.parts
+
+    def cleanup(self) -> None:
+        self._finish()
+        shutil.rmtree(self.directory, ignore_errors=True)
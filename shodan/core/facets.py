@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Iterable
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from .models import Match
+
+__all__ = ["FacetAggregator", "FIELDS"]
+
+# The facets counted for every match, and how to read them off one
+FIELDS: dict[str, Callable[[Match], object]] = {
+    "org": lambda match: match.org,
+    "port": lambda match: match.port,
+    "country": lambda match: match.location.country_name,
+    "asn": lambda match: match.asn,
+    "transport": lambda match: match.transport,
+}
+
+
+class FacetAggregator:
+    r"""Counts facets over every match the bot has looked at today
+
+    Facet values are interned to small integer ids and each field keeps a flat
+    array of the ids it has seen. Counting is a single :func:`numpy.bincount`
+    over that array when NumPy is installed, a :class:`collections.Counter`
+    otherwise. A host is only counted once a day, however many cached pages
+    and queries it shows up in.
+
+    Parameters
+    ----------
+    fields: Iterable[:class:`str`]
+        The facets to count, a subset of :data:`FIELDS`
+    """
+    __slots__ = ("day", "fields", "_values", "_ids", "_seen", "_observed")
+
+    def __init__(self, fields: Iterable[str] = FIELDS):
+        self.fields = tuple(fields)
+        self.clear()
+
+    def clear(self) -> None:
+        self.day = date.today()
+        self._values: dict[str, list[str]] = {field: [] for field in self.fields}
+        self._ids: dict[str, dict[str, int]] = {field: {} for field in self.fields}
+        self._observed: dict[str, array] = {field: array("I") for field in self.fields}
+        self._seen: set[int] = set()
+
+    def __len__(self) -> int:
+        """Distinct hosts counted today"""
+        return len(self._seen)
+
+    def _rollover(self) -> None:
+        if self.day != date.today():
+            self.clear()
+
+    def _intern(self, field: str, value: object) -> int:
+        value = str(value)
+        ids = self._ids[field]
+        if (id_ := ids.get(value)) is None:
+            id_ = ids[value] = len(self._values[field])
+            self._values[field].append(value)
+        return id_
+
+    def add(self, matches: Iterable[Match]) -> None:
+        """Count freshly ingested matches"""
+        self._rollover()
+        for match in matches:
+            key = hash((match.ip_str, match.port, match.timestamp))
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            for field in self.fields:
+                if (value := FIELDS[field](match)) is not None:
+                    self._observed[field].append(self._intern(field, value))
+
+    def top(self, field: str, amount: int = 10) -> list[tuple[str, int]]:
+        """The ``amount`` most common values of ``field`` with their counts"""
+        self._rollover()
+        observed, values = self._observed[field], self._values[field]
+        if not observed:
+            return []
+        if np is None:
+            return [
+                (values[id_], count)
+                for id_, count in Counter(observed).most_common(amount)
+            ]
+
+        counts = np.bincount(np.frombuffer(observed, dtype=np.uint32))
+        amount = min(amount, len(counts))
+        best = np.argpartition(counts, -amount)[-amount:]
+        best = best[np.argsort(counts[best], kind="stable")[::-1]]
+        return [(values[id_], int(counts[id_])) for id_ in best if counts[id_]]
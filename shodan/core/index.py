@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import ipaddress
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+if TYPE_CHECKING:
+    from .models import Match
+
+__all__ = ["HostIndex", "KnownHost", "parse_asn"]
+
+
+class KnownHost(NamedTuple):
+    ip_str: str
+    port: int
+    org: str | None
+    asn: int | None
+    timestamp: str | None
+
+
+def parse_asn(asn: str | int | None) -> int | None:
+    """``AS15169``, ``as15169`` and ``15169`` all become ``15169``"""
+    if asn is None or isinstance(asn, int):
+        return asn
+    asn = asn.strip().upper().removeprefix("AS")
+    return int(asn) if asn.isdigit() else None
+
+
+class HostIndex:
+    r"""An in-memory index over every host and port the bot has seen
+
+    Hosts are kept as sorted ``ip << 16 | port`` integers per address family,
+    so a CIDR lookup is two binary searches and a slice. Ports and ASNs map to
+    the sets of keys seen with them, ASNs are also kept sorted for range
+    lookups.
+    """
+    __slots__ = ("_keys", "_hosts", "_ports", "_asns", "_asn_keys")
+
+    def __init__(self):
+        # IPv4 keys fit in 48 bits, IPv6 ones don't
+        self._keys: dict[int, array | list[int]] = {4: array("Q"), 6: []}
+        self._hosts: dict[int, KnownHost] = {}
+        self._ports: dict[int, set[int]] = {}
+        self._asns: dict[int, set[int]] = {}
+        self._asn_keys: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    @staticmethod
+    def _key(ip: ipaddress.IPv4Address | ipaddress.IPv6Address, port: int) -> int:
+        # IPv6 keys are offset so they never collide with IPv4 ones
+        offset = 0 if ip.version == 4 else 1 << 144
+        return offset | int(ip) << 16 | port
+
+    def _insert(self, host: KnownHost, *, sort: bool = True) -> None:
+        try:
+            ip = ipaddress.ip_address(host.ip_str)
+        except ValueError:
+            return
+        key = self._key(ip, host.port)
+        known = self._hosts.get(key)
+        if known is None:
+            if sort:
+                insort(self._keys[ip.version], key)
+            else:
+                self._keys[ip.version].append(key)
+            self._ports.setdefault(host.port, set()).add(key)
+        elif (known.timestamp or "") > (host.timestamp or ""):
+            return
+        elif known.asn is not None and known.asn != host.asn:
+            self._asns[known.asn].discard(key)
+        self._hosts[key] = host
+        if host.asn is not None:
+            if host.asn not in self._asns:
+                self._asns[host.asn] = set()
+                if sort:
+                    insort(self._asn_keys, host.asn)
+                else:
+                    self._asn_keys.append(host.asn)
+            self._asns[host.asn].add(key)
+
+    def add(self, matches: Iterable[Match]) -> None:
+        """Index freshly ingested matches"""
+        for match in matches:
+            self._insert(
+                KnownHost(
+                    match.ip_str,
+                    match.port,
+                    match.org,
+                    parse_asn(match.asn),
+                    match.timestamp.isoformat() if match.timestamp else None,
+                )
+            )
+
+    def extend(self, hosts: Iterable[tuple]) -> None:
+        """Bulk load ``(ip_str, port, org, asn, timestamp)`` rows"""
+        for ip_str, port, org, asn, timestamp in hosts:
+            self._insert(
+                KnownHost(ip_str, port, org, parse_asn(asn), timestamp or None),
+                sort=False,
+            )
+        self._keys = {
+            4: array("Q", sorted(set(self._keys[4]))),
+            6: sorted(set(self._keys[6])),
+        }
+        self._asn_keys = sorted(set(self._asn_keys))
+
+    def _cidr(self, cidr: str) -> Iterable[int]:
+        network = ipaddress.ip_network(cidr, strict=False)
+        keys = self._keys[network.version]
+        low = self._key(network.network_address, 0)
+        high = self._key(network.broadcast_address, 0xFFFF)
+        return keys[bisect_left(keys, low) : bisect_right(keys, high)]
+
+    def _asn_range(self, first: int, last: int) -> set[int]:
+        low = bisect_left(self._asn_keys, first)
+        high = bisect_right(self._asn_keys, last)
+        return set().union(*(self._asns[asn] for asn in self._asn_keys[low:high]))
+
+    def query(
+        self,
+        *,
+        cidr: str | None = None,
+        ports: tuple[int, int] | None = None,
+        asns: tuple[int, int] | None = None,
+    ) -> list[KnownHost]:
+        """Hosts within a CIDR range, a port range and an ASN range
+
+        Raises :class:`ValueError` for an invalid CIDR.
+        """
+        keys: set[int] | None = set(self._cidr(cidr)) if cidr else None
+        if ports is not None:
+            first, last = ports
+            by_port = set().union(
+                *(keys for port, keys in self._ports.items() if first <= port <= last)
+            )
+            keys = by_port if keys is None else keys & by_port
+        if asns is not None:
+            by_asn = self._asn_range(*asns)
+            keys = by_asn if keys is None else keys & by_asn
+        if keys is None:
+            keys = self._hosts.keys()
+        return [self._hosts[key] for key in sorted(keys)]
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+from time import monotonic
+from typing import Iterable, Iterator
+
+from shodan.utils import logging
+from shodan.utils.config import Config
+
+from .ratelimit import Scheduler, TokenBucket
+
+__all__ = ["ApiKey", "KeyPool"]
+
+logger = logging.get_logger(__name__)
+
+
+class ApiKey:
+    r"""A Shodan API key with its own rate limit and credit balance
+
+    Parameters
+    ----------
+    key: :class:`str`
+        The Shodan API key
+    rate: :class:`float`
+        Requests per second the key may make
+    """
+    __slots__ = ("key", "bucket", "credits", "plan", "requests", "failures", "_until")
+
+    def __init__(self, key: str, rate: float = 1.0):
+        self.key = key
+        self.bucket = TokenBucket(rate=rate, capacity=1)
+        self.credits: int | None = None
+        self.plan: str | None = None
+        self.requests = 0
+        self.failures = 0
+        self._until = 0.0
+
+    @property
+    def masked(self) -> str:
+        return f"{self.key[:4]}…{self.key[-4:]}"
+
+    @property
+    def healthy(self) -> bool:
+        return monotonic() >= self._until
+
+    def disable(self, seconds: float) -> None:
+        """Skip the key for a while, e.g. after Shodan rejected it"""
+        self.failures += 1
+        self._until = monotonic() + seconds
+
+    def update(self, info: dict) -> None:
+        """Take the plan and credit balance from an ``/api-info`` response"""
+        self.credits = info.get("query_credits")
+        self.plan = info.get("plan")
+
+    def spend(self, credits: int) -> None:
+        if credits and self.credits is not None:
+            self.credits = max(0, self.credits - credits)
+
+    async def wait(self) -> None:
+        """Take a token and wait until the key's rate limit allows using it"""
+        self.requests += 1
+        if delay := self.bucket.reserve():
+            await asyncio.sleep(delay)
+
+    def __repr__(self) -> str:
+        return f"<ApiKey key={self.masked!r} credits={self.credits}>"
+
+
+class KeyPool:
+    r"""The Shodan API keys shared by every guild and those of single guilds
+
+    The shared keys form one lane and every guild with keys of its own another.
+    Each lane has a :class:`Scheduler` refilled at the summed rate of its keys,
+    so throughput grows with the amount of keys, and every dispatched call is
+    handed the healthy key that can be used the soonest. Keys added at runtime
+    are persisted to ``config``.
+
+    Parameters
+    ----------
+    rate: :class:`float`
+        Requests per second a single key may make
+    shared: Iterable[:class:`str`]
+        Shared keys from the environment, these aren't persisted
+    config: Optional[:class:`Config`]
+        The document keys added at runtime are kept in
+    """
+
+    COOLDOWN = 300
+
+    def __init__(
+        self,
+        *,
+        rate: float = 1.0,
+        shared: Iterable[str] = (),
+        config: Config | None = None,
+    ):
+        self.rate = rate
+        self.config = config
+        self._keys: dict[int | None, list[ApiKey]] = {}
+        self._lanes: dict[int | None, Scheduler] = {}
+        self._env = set(shared)
+        for key in self._env:
+            self._add(key, None)
+        for guild, keys in (config.data if config is not None else {}).items():
+            for key in keys:
+                self._add(key, None if guild == "shared" else int(guild))
+
+    def __iter__(self) -> Iterator[tuple[int | None, ApiKey]]:
+        for guild, keys in self._keys.items():
+            for key in keys:
+                yield guild, key
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+    def lane(self, guild: int | None) -> int | None:
+        """The guild whose keys calls made in ``guild`` use, ``None`` if shared"""
+        return guild if self._keys.get(guild) else None
+
+    def keys(self, guild: int | None = None) -> list[ApiKey]:
+        """The keys calls made in ``guild`` are spread across"""
+        return self._keys.get(self.lane(guild), [])
+
+    def available(self, guild: int | None = None) -> bool:
+        return bool(self.keys(guild))
+
+    def scheduler(self, guild: int | None = None) -> Scheduler:
+        """The scheduler of the lane ``guild`` belongs to"""
+        lane = self.lane(guild)
+        if lane not in self._lanes:
+            self._lanes[lane] = Scheduler(TokenBucket(rate=self.rate, capacity=1))
+            self._resize(lane)
+        return self._lanes[lane]
+
+    def _resize(self, lane: int | None) -> None:
+        if (scheduler := self._lanes.get(lane)) is not None:
+            amount = max(1, len(self._keys.get(lane, ())))
+            scheduler.bucket.rate = self.rate * amount
+            scheduler.bucket.capacity = amount
+
+    def _add(self, key: str, guild: int | None) -> ApiKey:
+        keys = self._keys.setdefault(guild, [])
+        for known in keys:
+            if known.key == key:
+                return known
+        keys.append(api_key := ApiKey(key, self.rate))
+        self._resize(guild)
+        return api_key
+
+    def add(self, key: str, guild: int | None = None) -> ApiKey:
+        """Add a key to a guild's keys, or to the shared ones if ``guild`` is ``None``"""
+        api_key = self._add(key, guild)
+        self.save()
+        return api_key
+
+    def remove(self, key: str, guild: int | None = None) -> bool:
+        keys = self._keys.get(guild, [])
+        for api_key in keys:
+            if api_key.key == key:
+                keys.remove(api_key)
+                break
+        else:
+            return False
+        if not keys and guild is not None:
+            # Later calls fall back to the shared lane
+            self._keys.pop(guild)
+            if (scheduler := self._lanes.pop(guild, None)) is not None:
+                scheduler.close()
+        self._resize(guild)
+        self.save()
+        return True
+
+    def save(self) -> None:
+        if self.config is None:
+            return
+        data = {}
+        for guild, keys in self._keys.items():
+            name = "shared" if guild is None else str(guild)
+            data[name] = [key.key for key in keys if key.key not in self._env]
+        self.config.replace(data)
+
+    def pick(self, guild: int | None = None, *, credits: int = 0) -> ApiKey | None:
+        """The key a call made in ``guild`` should use
+
+        Healthy keys with credits left come first, then the one that's free
+        the soonest and has made the fewest requests.
+        """
+        keys = self.keys(guild)
+        if not keys:
+            return None
+        usable = [
+            key
+            for key in keys
+            if key.healthy and (not credits or key.credits is None or key.credits)
+        ]
+        return min(usable or keys, key=lambda k: (k.bucket.delay(), k.requests))
+
+    async def acquire(self, guild: int | None = None, *, credits: int = 0) -> ApiKey:
+        """Pick a key and wait for its rate limit"""
+        key = self.pick(guild, credits=credits)
+        if key is None:
+            raise LookupError("No Shodan API key is set")
+        await key.wait()
+        return key
+
+    def close(self) -> None:
+        for scheduler in self._lanes.values():
+            scheduler.close()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import sys
+from bisect import bisect_left
+from collections import Counter
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from .bot import MainBot
+
+__all__ = ["Histogram", "Metrics", "BUCKETS", "rss"]
+
+# Upper bounds in seconds, from a cache hit to a slow deep search
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def rss() -> int | None:
+    """Resident memory of the process in bytes, if the platform tells"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Only the peak is known here, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _labels(**labels: object) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+        + "}"
+    )
+
+
+class Histogram:
+    r"""Counts observations into cumulative buckets like a Prometheus histogram
+
+    Parameters
+    ----------
+    bounds: Iterable[:class:`float`]
+        The upper bounds of the buckets, ascending
+    """
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Iterable[float] = BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name: str, **labels: object) -> Iterator[str]:
+        cumulative = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+        yield f"{name}_sum{_labels(**labels)} {self.sum}"
+        yield f"{name}_count{_labels(**labels)} {self.count}"
+
+
+class Metrics:
+    r"""The bot's numbers in the Prometheus text exposition format
+
+    Commands are counted as they complete, everything else is read from the
+    bot when the metrics are collected. Collecting happens on the event loop,
+    the keep-alive server's thread goes through :meth:`collect_threadsafe`.
+
+    Parameters
+    ----------
+    bot: :class:`MainBot`
+        The bot to report on
+    """
+
+    def __init__(self, bot: MainBot):
+        self.bot = bot
+        self.commands: Counter[tuple[str, str]] = Counter()
+        self.durations: dict[str, Histogram] = {}
+
+    def command(self, name: str, seconds: float, *, failed: bool = False) -> None:
+        """Record an application command that completed or failed"""
+        self.commands[name, "error" if failed else "ok"] += 1
+        if (histogram := self.durations.get(name)) is None:
+            histogram = self.durations[name] = Histogram()
+        histogram.observe(max(seconds, 0.0))
+
+    def snapshot(self) -> dict[str, float | int | None]:
+        """The gauges at this moment, must be called on the event loop"""
+        from .paginator import PaginatorView
+
+        latency = self.bot.latency
+        return {
+            "gateway_latency": latency if math.isfinite(latency) else None,
+            "tasks": len(asyncio.all_tasks()),
+            "open_views": sum(
+                not view.is_finished() for view in list(PaginatorView.open)
+            ),
+            "rss": rss(),
+            "commands": sum(self.commands.values()),
+        }
+
+    def collect(self) -> str:
+        """Render every metric, must be called on the event loop"""
+        gauges = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, description: str) -> None:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        if gauges["gateway_latency"] is not None:
+            metric(
+                "shodan_gateway_latency_seconds", "gauge", "Discord heartbeat latency"
+            )
+            lines.append(f"shodan_gateway_latency_seconds {gauges['gateway_latency']}")
+
+        metric("shodan_commands_total", "counter", "Application commands run")
+        for (name, status), count in sorted(self.commands.items()):
+            lines.append(
+                f"shodan_commands_total{_labels(command=name, status=status)} {count}"
+            )
+        metric(
+            "shodan_command_duration_seconds",
+            "histogram",
+            "Time from an interaction's creation to its command completing",
+        )
+        for name, histogram in sorted(self.durations.items()):
+            lines.extend(
+                histogram.lines("shodan_command_duration_seconds", command=name)
+            )
+
+        latency = self.bot.shodan.latency
+        metric("shodan_api_requests_total", "counter", "Shodan API responses")
+        for endpoint, stats in latency.items():
+            for status, count in sorted(stats.statuses.items()):
+                labels = _labels(endpoint=endpoint, status=status)
+                lines.append(f"shodan_api_requests_total{labels} {count}")
+        metric("shodan_api_duration_seconds", "histogram", "Shodan API latency")
+        for endpoint, stats in latency.items():
+            lines.extend(
+                stats.histogram.lines("shodan_api_duration_seconds", endpoint=endpoint)
+            )
+
+        cache = self.bot.cache
+        metric("shodan_cache_hits_total", "counter", "Responses served from cache")
+        lines.append(f"shodan_cache_hits_total {cache.hits}")
+        metric("shodan_cache_misses_total", "counter", "Responses not in cache")
+        lines.append(f"shodan_cache_misses_total {cache.misses}")
+        metric("shodan_cache_hit_ratio", "gauge", "Share of cache lookups that hit")
+        lines.append(f"shodan_cache_hit_ratio {cache.hit_ratio}")
+
+        metric("shodan_open_views", "gauge", "Paginators still listening")
+        lines.append(f"shodan_open_views {gauges['open_views']}")
+        metric("shodan_asyncio_tasks", "gauge", "Unfinished asyncio tasks")
+        lines.append(f"shodan_asyncio_tasks {gauges['tasks']}")
+        if gauges["rss"] is not None:
+            metric("process_resident_memory_bytes", "gauge", "Resident memory size")
+            lines.append(f"process_resident_memory_bytes {gauges['rss']}")
+        return "\n".join(lines) + "\n"
+
+    async def _collect(self) -> str:
+        return self.collect()
+
+    def collect_threadsafe(self, timeout: float = 5.0) -> str | None:
+        """:meth:`collect` from another thread, ``None`` while the bot isn't running"""
+        loop = getattr(self.bot, "loop", None)
+        if loop is None or not loop.is_running():
+            return None
+        return asyncio.run_coroutine_threadsafe(self._collect(), loop).result(timeout)
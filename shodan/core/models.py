@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cves import CVE, CVES
+
+if TYPE_CHECKING:
+    from .blobs import BlobStore
+
+__all__ = ["Match", "Location"]
+
+
+class Location:
+    __slots__ = ("city", "country_name", "country_code", "latitude", "longitude")
+
+    def __init__(self, data: dict):
+        self.city: str | None = data.get("city")
+        self.country_name: str | None = data.get("country_name")
+        self.country_code: str | None = data.get("country_code")
+        self.latitude: float | None = data.get("latitude")
+        self.longitude: float | None = data.get("longitude")
+
+
+class Match:
+    r"""A Shodan banner pruned down to the fields the bot renders
+
+    The raw banner, the HTTP headers and the HTML body are the bulk of a
+    match. They're spilled to the :class:`BlobStore` at ingest and only read
+    back when accessed.
+
+    Parameters
+    ----------
+    data: :class:`dict`
+        A decoded match of a Shodan search response
+    blobs: :class:`BlobStore`
+        Where to keep the large fields of the match
+    """
+    __slots__ = (
+        "ip_str",
+        "port",
+        "transport",
+        "org",
+        "asn",
+        "timestamp",
+        "hostnames",
+        "location",
+        "vulns",
+        "verified",
+        "scores",
+        "_store",
+        "_blobs",
+    )
+
+    def __init__(self, data: dict, blobs: BlobStore):
+        self.ip_str: str = data["ip_str"]
+        self.port: int = data["port"]
+        self.transport: str = data.get("transport", "tcp")
+        self.org: str | None = data.get("org")
+        self.asn: str | None = data.get("asn")
+        self.timestamp: datetime | None = (
+            datetime.fromisoformat(data["timestamp"]) if data.get("timestamp") else None
+        )
+        self.hostnames: tuple[str, ...] = tuple(data.get("hostnames") or ())
+        self.location = Location(data.get("location") or {})
+        vulns = (data.get("vulns") or {}).items()
+        # Worst first, so filtering by CVSS is a bisect over the scores
+        self.vulns: tuple[CVE, ...] = tuple(
+            sorted(
+                (CVES.intern(cve, vuln) for cve, vuln in vulns),
+                key=lambda cve: (-cve.score, cve.id),
+            )
+        )
+        self.verified: frozenset[str] = frozenset(
+            cve for cve, vuln in vulns if vuln.get("verified")
+        )
+        self.scores = array("d", (-cve.score for cve in self.vulns))
+
+        self._store = blobs
+        self._blobs: dict[str, str] = {}
+        raw = data.get("data")
+        if "http" in data:
+            if raw is not None:
+                self._put("headers", raw.split("\r\n\r\n")[0])
+            if (data["http"] or {}).get("html"):
+                self._put("html", data["http"]["html"])
+        elif raw:
+            self._put("data", raw)
+
+    def at_least(self, cvss: float) -> int:
+        """How many of the vulnerabilities have a CVSS score of ``cvss`` or more"""
+        return bisect_right(self.scores, -cvss)
+
+    def _put(self, name: str, text: str) -> None:
+        self._blobs[name] = self._store.put(text)
+
+    def _load(self, name: str) -> str | None:
+        if name not in self._blobs:
+            return None
+        blob = self._store.read(self._blobs[name])
+        return blob.decode("utf-8") if blob is not None else None
+
+    def key(self, name: str) -> str | None:
+        """The blob store key of the ``headers``, ``html`` or ``data`` blob"""
+        return self._blobs.get(name)
+
+    def path(self, name: str) -> Path | None:
+        """The file holding the ``headers``, ``html`` or ``data`` blob"""
+        if name not in self._blobs:
+            return None
+        return self._store.path(self._blobs[name])
+
+    @property
+    def headers(self) -> str | None:
+        """The HTTP response headers of the banner"""
+        return self._load("headers")
+
+    @property
+    def html(self) -> str | None:
+        """The HTML body of an HTTP banner"""
+        return self._load("html")
+
+    @property
+    def data(self) -> str | None:
+        """The raw banner of a non-HTTP service"""
+        return self._load("data")
+
+    @property
+    def is_http(self) -> bool:
+        return "headers" in self._blobs
+
+    @property
+    def size(self) -> int:
+        """Approximate amount of memory held by the match"""
+        return (
+            sys.getsizeof(self)
+            + sum(len(h) for h in self.hostnames)
+            + 16 * len(self.vulns)
+            + sum(len(key) for key in self._blobs.values())
+            + 256
+        )
+
+    def __repr__(self) -> str:
+        return f"<Match ip_str={self.ip_str!r} port={self.port}>"
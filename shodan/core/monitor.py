@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import random
+from time import time
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+if TYPE_CHECKING:
+    from .models import Match
+
+__all__ = ["SavedSearch", "Delta", "fingerprint"]
+
+
+def fingerprint(*parts: object) -> int:
+    """A 64-bit hash of ``parts`` that stays the same across restarts"""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+class Delta(NamedTuple):
+    new: list[Match]
+    changed: list[Match]
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed)
+
+    def __len__(self) -> int:
+        return len(self.new) + len(self.changed)
+
+
+class SavedSearch:
+    r"""A search re-run on an interval and diffed against what it has seen
+
+    A run only returns the first page of results, and hosts move between
+    pages from one run to the next. So every ``(ip, port)`` service seen is
+    remembered along with a hash of its banner timestamp and when it was
+    last seen, not just those of the last run. A match whose service was
+    never seen is new, one whose timestamp differs changed. Services not
+    seen for ``RETENTION`` seconds are forgotten, and past ``MAX_SEEN`` the
+    ones seen the longest ago go first.
+
+    Parameters
+    ----------
+    id: :class:`int`
+        Identifies the search within its guild
+    guild: :class:`int`
+        The guild the search belongs to
+    channel: :class:`int`
+        Where deltas are posted
+    query: :class:`str`
+        The Shodan search query
+    interval: :class:`float`
+        Seconds between runs
+    """
+    __slots__ = (
+        "id",
+        "guild",
+        "channel",
+        "query",
+        "interval",
+        "next_run",
+        "runs",
+        "seen",
+    )
+
+    JITTER = 0.1
+    RETENTION = 30 * 24 * 60 * 60
+    MAX_SEEN = 5000
+
+    def __init__(self, id: int, guild: int, channel: int, query: str, interval: float):
+        self.id = id
+        self.guild = guild
+        self.channel = channel
+        self.query = query
+        self.interval = interval
+        self.next_run = time() + random.uniform(0, interval * self.JITTER)
+        self.runs = 0
+        # service -> (timestamp hash, last seen)
+        self.seen: dict[int, tuple[int, float]] = {}
+
+    @property
+    def due(self) -> bool:
+        return self.next_run <= time()
+
+    def schedule(self) -> None:
+        """Plan the next run, jittered so searches made together drift apart"""
+        jitter = self.interval * self.JITTER
+        self.next_run = time() + self.interval + random.uniform(-jitter, jitter)
+
+    def diff(self, matches: Iterable[Match]) -> Delta:
+        """Diff a run against every service seen before and remember it"""
+        delta = Delta([], [])
+        now = time()
+        for match in matches:
+            service = fingerprint(match.ip_str, match.port)
+            stamp = fingerprint(match.timestamp)
+            known = self.seen.get(service)
+            self.seen[service] = (stamp, now)
+            if known is None:
+                delta.new.append(match)
+            elif known[0] != stamp:
+                delta.changed.append(match)
+        self._forget(now)
+        self.runs += 1
+        return delta
+
+    def _forget(self, now: float) -> None:
+        cutoff = now - max(self.RETENTION, self.interval * 2)
+        self.seen = {
+            service: entry for service, entry in self.seen.items() if entry[1] >= cutoff
+        }
+        if len(self.seen) > self.MAX_SEEN:
+            recent = heapq.nlargest(
+                self.MAX_SEEN, self.seen.items(), key=lambda item: item[1][1]
+            )
+            self.seen = dict(recent)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "guild": self.guild,
+            "channel": self.channel,
+            "query": self.query,
+            "interval": self.interval,
+            "next_run": self.next_run,
+            "runs": self.runs,
+            "seen": [[service, *entry] for service, entry in self.seen.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> SavedSearch:
+        search = cls(
+            data["id"], data["guild"], data["channel"], data["query"], data["interval"]
+        )
+        search.next_run = data.get("next_run", search.next_run)
+        search.runs = data.get("runs", 0)
+        search.seen = {
+            service: (stamp, seen) for service, stamp, seen in data.get("seen", ())
+        }
+        return search
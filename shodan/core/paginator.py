@@ -1,10 +1,72 @@
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Sequence, overload
+from weakref import WeakSet
+
 from nextcord import ButtonStyle, Embed, Interaction, Member, Message, ui
 
 from shodan.utils.util import Raise
 
-__all__ = ["Paginator"]
+from .editor import MessageEditor, channel_bucket
+
+__all__ = ["Paginator", "PaginatorView", "LazyEmbeds"]
+
+
+class LazyEmbeds(Sequence[Embed]):
+    r"""A sequence of embeds that are only rendered when a page is shown
+
+    Parameters
+    ----------
+    length: :class:`int`
+        The amount of pages
+    render: Callable[[:class:`int`], :class:`Embed`]
+        Builds the embed of the page at the given index
+    memo: :class:`int`
+        How many recently viewed pages to keep rendered
+    """
+    __slots__ = ("length", "render", "memo", "_pages")
+
+    def __init__(self, length: int, render: Callable[[int], Embed], memo: int = 5):
+        self.length = length
+        self.render = render
+        self.memo = memo
+        self._pages: OrderedDict[int, Embed] = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.length
+
+    @overload
+    def __getitem__(self, index: int) -> Embed:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Embed]:
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("page index out of range")
+
+        if index in self._pages:
+            self._pages.move_to_end(index)
+            return self._pages[index]
+        embed = self._pages[index] = self.render(index)
+        if len(self._pages) > self.memo:
+            self._pages.popitem(last=False)
+        return embed
+
+    def invalidate(self, index: int | None = None) -> None:
+        """Forget the rendered page at ``index`` or every page"""
+        if index is None:
+            self._pages.clear()
+        else:
+            self._pages.pop(index, None)
 
 
 # noinspection PyArgumentList
@@ -15,8 +77,8 @@ class Paginator:
     ----------
     ctx: :class:`Message` | :class:`Interaction`
         The message to reply to
-    embeds: list[:class:`Embed`]
-        The embeds to paginate
+    embeds: Sequence[:class:`Embed`]
+        The embeds to paginate, use :class:`LazyEmbeds` to render them on demand
     items: Optional[list[:class:`ui.Item`]]
         The items to add to the paginator
     """
@@ -25,7 +87,7 @@ class Paginator:
     def __init__(
         self,
         ctx: Message | Interaction,
-        embeds: list[Embed],
+        embeds: Sequence[Embed],
         items: list[ui.Item] | None = None,
     ):
         self.ctx = ctx
@@ -59,16 +121,21 @@ class PaginatorView(ui.View):
     ----------
     user: :class:`Member`
         The user to check for
-    embeds: list[:class:`Embed`]
+    embeds: Sequence[:class:`Embed`]
         The embeds to paginate
     """
 
-    def __init__(self, user: Member, embeds: list[Embed]):
+    # Every paginator that hasn't been collected yet, for the metrics
+    open: WeakSet[PaginatorView] = WeakSet()
+
+    def __init__(self, user: Member, embeds: Sequence[Embed]):
         super().__init__(timeout=60 * 2)
+        PaginatorView.open.add(self)
         self.user = user
         self.embeds = embeds
         self.index = 0
         self.msg: Message | None = None
+        self.editor: MessageEditor | None = None
         self.add_item(
             ui.Button(
                 custom_id="page_count",
@@ -83,12 +150,27 @@ class PaginatorView(ui.View):
         await Raise(interaction, "You can't use this button").error()
         return False
 
-    async def button_callback(self, inter: Interaction):
+    def schedule_edit(self, edit: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Edit the message through the view's :class:`MessageEditor`
+
+        Rapid page flips replace each other, so only the latest page is sent.
+        """
+        if self.editor is None:
+            channel = getattr(self.msg, "channel", None)
+            self.editor = MessageEditor(channel_bucket(channel.id) if channel else None)
+        return self.editor.schedule(edit)
+
+    async def _edit(self) -> Message | None:
         for item in self.children:
             if isinstance(item, ui.Button) and item.custom_id == "page_count":
                 item.label = f"Page {self.index + 1}/{len(self.embeds)}"
 
-        await inter.response.edit_message(embed=self.embeds[self.index], view=self)
+        return await self.msg.edit(embed=self.embeds[self.index], view=self)
+
+    async def button_callback(self, inter: Interaction | None):
+        if inter is not None and not inter.response.is_done():
+            await inter.response.defer()
+        await self.schedule_edit(self._edit)
 
     @ui.button(emoji="⬅️", style=ButtonStyle.gray)
     async def button_left_callback(self, _, inter: Interaction):
@@ -114,6 +196,8 @@ class PaginatorView(ui.View):
         self._dispatch_timeout()
 
     async def on_timeout(self) -> None:
+        if self.editor is not None:
+            self.editor.cancel()
         if len(self.embeds) < 2 or not self.msg:
             return
         if isinstance(self.msg, Interaction):
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from enum import IntEnum
+from time import monotonic
+from typing import Any, Awaitable, Callable, Generator, Hashable, Iterator
+
+from shodan.utils import logging
+
+__all__ = ["TokenBucket", "Priority", "Ticket", "Scheduler"]
+
+logger = logging.get_logger(__name__)
+
+
+class TokenBucket:
+    r"""A token bucket refilled at a constant rate
+
+    Parameters
+    ----------
+    rate: :class:`float`
+        Tokens added per second
+    capacity: :class:`float`
+        Maximum amount of tokens that can be saved up for a burst
+    """
+    __slots__ = ("rate", "capacity", "_tokens", "_updated", "_paused_until")
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def delay(self) -> float:
+        """Seconds to wait until a token can be taken"""
+        self._refill()
+        wait = max(0.0, self._paused_until - monotonic())
+        if self._tokens >= 1:
+            return wait
+        return max(wait, (1 - self._tokens) / self.rate)
+
+    def consume(self) -> bool:
+        """Take a token if one is available"""
+        if self.delay():
+            return False
+        self._tokens -= 1
+        return True
+
+    def reserve(self) -> float:
+        """Take a token ahead of time and return the seconds until it may be used"""
+        delay = self.delay()
+        self._tokens -= 1
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. after the API answered 429"""
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class Ticket:
+    r"""A queued call waiting for the :class:`Scheduler` to dispatch it
+
+    Awaiting the ticket returns the result of the call.
+    """
+    __slots__ = ("factory", "priority", "guild", "user", "future")
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        priority: Priority,
+        guild: Hashable,
+        user: Hashable,
+    ):
+        self.factory = factory
+        self.priority = priority
+        self.guild = guild
+        self.user = user
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self.future.__await__()
+
+
+class Scheduler:
+    r"""Paces calls through a :class:`TokenBucket`
+
+    Queued calls are dispatched by priority first. Within a priority the
+    scheduler takes turns between guilds, and within a guild between users,
+    so one busy user can't starve everyone else.
+
+    Parameters
+    ----------
+    bucket: :class:`TokenBucket`
+        The rate limit shared by every call going through the scheduler
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.dispatched = 0
+        self._queues: dict[Priority, OrderedDict[Hashable, OrderedDict]] = {
+            p: OrderedDict() for p in Priority
+        }
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return sum(
+            len(tickets)
+            for guilds in self._queues.values()
+            for users in guilds.values()
+            for tickets in users.values()
+        )
+
+    def submit(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        *,
+        guild: Hashable = None,
+        user: Hashable = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Ticket:
+        """Queue ``factory`` to be called once the rate limit allows it"""
+        ticket = Ticket(factory, priority, guild, user)
+        users = self._queues[priority].setdefault(guild, OrderedDict())
+        users.setdefault(user, deque()).append(ticket)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """How many queued calls will be dispatched before ``ticket``"""
+        for index, queued in enumerate(self._order()):
+            if queued is ticket:
+                return index
+        return 0
+
+    def _order(self) -> Iterator[Ticket]:
+        """Yield the queued tickets in the order they would be dispatched"""
+        for priority in Priority:
+            guilds = deque(
+                (guild, deque((user, deque(t)) for user, t in users.items()))
+                for guild, users in self._queues[priority].items()
+            )
+            while guilds:
+                guild, users = guilds.popleft()
+                user, tickets = users.popleft()
+                yield tickets.popleft()
+                if tickets:
+                    users.append((user, tickets))
+                if users:
+                    guilds.append((guild, users))
+
+    def _pop(self) -> Ticket | None:
+        for priority in Priority:
+            guilds = self._queues[priority]
+            if not guilds:
+                continue
+            guild, users = guilds.popitem(last=False)
+            user, tickets = users.popitem(last=False)
+            ticket = tickets.popleft()
+            # Rotate both levels so the next turn goes to someone else
+            if tickets:
+                users[user] = tickets
+            if users:
+                guilds[guild] = users
+            return ticket
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            if delay := self.bucket.delay():
+                await asyncio.sleep(delay)
+                continue
+            ticket = self._pop()
+            if ticket is None:
+                self._wakeup.clear()
+                continue
+            if ticket.future.done():  # The caller gave up while waiting
+                continue
+            self.bucket.consume()
+            self.dispatched += 1
+            task = asyncio.create_task(self._dispatch(ticket))
+            # A caller giving up mid-call stops the call too
+            ticket.future.add_done_callback(
+                lambda future, task=task: future.cancelled() and task.cancel()
+            )
+
+    @staticmethod
+    async def _dispatch(ticket: Ticket) -> None:
+        try:
+            result = await ticket.factory()
+        except asyncio.CancelledError:
+            ticket.future.cancel()
+            raise
+        except Exception as e:
+            if not ticket.future.done():
+                ticket.future.set_exception(e)
+        else:
+            if not ticket.future.done():
+                ticket.future.set_result(result)
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for ticket in self._order():
+            ticket.future.cancel()
+        for guilds in self._queues.values():
+            guilds.clear()
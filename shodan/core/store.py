@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import zlib
+from time import time
+from typing import Hashable
+
+from shodan.utils import logging
+
+__all__ = ["ResultStore"]
+
+logger = logging.get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    org TEXT,
+    asn TEXT,
+    fetched REAL NOT NULL,
+    raw BLOB NOT NULL,
+    UNIQUE (ip, port, timestamp)
+);
+CREATE INDEX IF NOT EXISTS matches_port ON matches (port);
+CREATE INDEX IF NOT EXISTS matches_org ON matches (org);
+CREATE INDEX IF NOT EXISTS matches_timestamp ON matches (timestamp);
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    fetched REAL NOT NULL,
+    total INTEGER NOT NULL,
+    facets TEXT NOT NULL,
+    matches TEXT NOT NULL
+);
+"""
+
+# Only the fields a Match is built from are persisted
+MATCH_FIELDS = (
+    "ip_str",
+    "port",
+    "transport",
+    "org",
+    "asn",
+    "timestamp",
+    "hostnames",
+    "location",
+    "vulns",
+    "data",
+)
+
+
+def _prune(match: dict) -> dict:
+    pruned = {field: match[field] for field in MATCH_FIELDS if field in match}
+    if "http" in match:
+        pruned["http"] = {"html": (match["http"] or {}).get("html")}
+    return pruned
+
+
+class ResultStore:
+    r"""Persists search responses and their matches in SQLite
+
+    The database runs in WAL mode, so lookups don't wait for writes. Writes
+    are queued and committed in batches by a writer thread, lookups run in
+    the default executor.
+
+    Parameters
+    ----------
+    path: :class:`str`
+        The database file
+    ttl: :class:`float`
+        Seconds a stored search response is served for
+    batch: :class:`int`
+        Maximum amount of queued writes committed in one transaction
+    """
+
+    def __init__(self, path: str, *, ttl: float = 3600, batch: int = 64):
+        self.path = path
+        self.ttl = ttl
+        self.batch = batch
+        self.hits = 0
+        self.misses = 0
+        self._queue: queue.Queue[tuple[str, dict] | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(SCHEMA)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="shodan-store", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @staticmethod
+    def make_key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def save_search(self, key: Hashable, results: dict) -> None:
+        """Queue a decoded search response to be written"""
+        self._queue.put((self.make_key(key), results))
+
+    async def load_search(self, key: Hashable) -> dict | None:
+        """A stored search response that is still fresh"""
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, self._load_search, self.make_key(key)
+        )
+        if results is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return results
+
+    def _load_search(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._reader.execute(
+                "SELECT fetched, total, facets, matches FROM searches WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[0] + self.ttl < time():
+                return None
+            matches = []
+            for ip, port, timestamp in json.loads(row[3]):
+                found = self._reader.execute(
+                    "SELECT raw FROM matches WHERE ip = ? AND port = ? AND timestamp = ?",
+                    (ip, port, timestamp),
+                ).fetchone()
+                if found is None:  # Partially written, fetch it again
+                    return None
+                matches.append(json.loads(zlib.decompress(found[0])))
+        return {"matches": matches, "total": row[1], "facets": json.loads(row[2])}
+
+    def hosts(self) -> list[tuple]:
+        """``(ip, port, org, asn, timestamp)`` of every stored match"""
+        with self._lock:
+            return self._reader.execute(
+                "SELECT ip, port, org, asn, timestamp FROM matches"
+            ).fetchall()
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        closing = False
+        while not closing:
+            items = [self._queue.get()]
+            while len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                closing = True
+                items = [item for item in items if item is not None]
+            try:
+                with db:
+                    for key, results in items:
+                        self._write_search(db, key, results)
+            except sqlite3.Error as e:
+                logger.error("Writing %s search(es) failed: %s", len(items), e)
+        db.close()
+
+    @staticmethod
+    def _write_search(db: sqlite3.Connection, key: str, results: dict) -> None:
+        now = time()
+        matches = results.get("matches", ())
+        db.executemany(
+            "INSERT INTO matches (ip, port, timestamp, org, asn, fetched, raw) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (ip, port, timestamp) "
+            "DO UPDATE SET fetched = excluded.fetched, raw = excluded.raw",
+            [
+                (
+                    match["ip_str"],
+                    match["port"],
+                    match.get("timestamp") or "",
+                    match.get("org"),
+                    match.get("asn"),
+                    now,
+                    zlib.compress(json.dumps(_prune(match)).encode("utf-8"), 1),
+                )
+                for match in matches
+            ],
+        )
+        db.execute(
+            "INSERT OR REPLACE INTO searches (key, fetched, total, facets, matches) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                key,
+                now,
+                results.get("total", 0),
+                json.dumps(results.get("facets", {})),
+                json.dumps(
+                    [
+                        (m["ip_str"], m["port"], m.get("timestamp") or "")
+                        for m in matches
+                    ]
+                ),
+            ),
+        )
+
+    def close(self) -> None:
+        """Flush the queued writes and close the database"""
+        self._queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._reader.close()
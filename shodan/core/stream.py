@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from time import monotonic
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+from aiohttp import ClientError, ClientSession, ClientTimeout
+
+from shodan.utils import logging
+
+from .editor import channel_bucket
+
+__all__ = ["Subscription", "StreamConsumer", "iter_ndjson"]
+
+logger = logging.get_logger(__name__)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Decode newline-delimited JSON as the chunks arrive
+
+    Lines may span any amount of chunks, blank lines are keep-alives and
+    lines that don't decode are skipped.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.debug("Skipping a malformed stream line")
+        del buffer[:start]
+
+
+class Subscription:
+    r"""Which banners of the stream a channel wants
+
+    An empty filter matches everything.
+
+    Parameters
+    ----------
+    guild: :class:`int`
+        The guild of the channel
+    channel: :class:`int`
+        Where matching banners are posted
+    ports: Iterable[:class:`int`]
+        Ports the service has to run on
+    countries: Iterable[:class:`str`]
+        Country codes the host has to be in
+    text: Optional[:class:`str`]
+        Text the organization or a hostname has to contain
+    """
+    __slots__ = ("guild", "channel", "ports", "countries", "text")
+
+    def __init__(
+        self,
+        guild: int,
+        channel: int,
+        *,
+        ports: Iterable[int] = (),
+        countries: Iterable[str] = (),
+        text: str | None = None,
+    ):
+        self.guild = guild
+        self.channel = channel
+        self.ports = frozenset(ports)
+        self.countries = frozenset(country.upper() for country in countries)
+        self.text = text.lower() if text else None
+
+    def matches(self, banner: dict) -> bool:
+        if self.ports and banner.get("port") not in self.ports:
+            return False
+        if self.countries:
+            country = (banner.get("location") or {}).get("country_code")
+            if country not in self.countries:
+                return False
+        if self.text:
+            names = [banner.get("org") or "", *(banner.get("hostnames") or ())]
+            if not any(self.text in name.lower() for name in names):
+                return False
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            "guild": self.guild,
+            "channel": self.channel,
+            "ports": sorted(self.ports),
+            "countries": sorted(self.countries),
+            "text": self.text,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Subscription:
+        return cls(
+            data["guild"],
+            data["channel"],
+            ports=data.get("ports", ()),
+            countries=data.get("countries", ()),
+            text=data.get("text"),
+        )
+
+
+class StreamConsumer:
+    r"""Consumes the Shodan banner stream and fans it out to channels
+
+    Every subscribed channel has a bounded queue and a sender task that posts
+    the queued banners in batches. The reader never waits on a queue: when a
+    slow channel's queue is full its oldest banner is dropped to make room,
+    so one channel can't hold the stream back for everyone else.
+
+    Parameters
+    ----------
+    session: :class:`ClientSession`
+        The session to connect with
+    url: :class:`str`
+        The stream endpoint
+    key: Callable[[], Optional[:class:`str`]]
+        Returns the API key to connect with
+    post: Callable[[:class:`int`, List[:class:`dict`]], Awaitable]
+        Posts a batch of banners to a channel
+    queue_size: :class:`int`
+        Banners a channel may have waiting
+    batch: :class:`int`
+        Maximum amount of banners per post
+    flush: :class:`float`
+        Seconds a banner may wait for its batch to fill up
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        url: str,
+        *,
+        key: Callable[[], str | None],
+        post: Callable[[int, list[dict]], Awaitable[Any]],
+        queue_size: int = 100,
+        batch: int = 10,
+        flush: float = 2.0,
+    ):
+        self.session = session
+        self.url = url
+        self.key = key
+        self.post = post
+        self.queue_size = queue_size
+        self.batch = batch
+        self.flush = flush
+        self.subscriptions: dict[int, Subscription] = {}
+        self.received = 0
+        self.bytes = 0
+        self.matched = 0
+        self.dropped = 0
+        self.posted = 0
+        self.batches = 0
+        self.reconnects = 0
+        self._started = monotonic()
+        self._queues: dict[int, asyncio.Queue[dict]] = {}
+        self._senders: dict[int, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def throughput(self) -> float:
+        """Banners received per second since the consumer started"""
+        return self.received / max(monotonic() - self._started, 1e-9)
+
+    def subscribe(self, subscription: Subscription) -> None:
+        self.subscriptions[subscription.channel] = subscription
+        if subscription.channel not in self._queues:
+            self._queues[subscription.channel] = asyncio.Queue(self.queue_size)
+            self._senders[subscription.channel] = asyncio.create_task(
+                self._send(subscription.channel)
+            )
+
+    def unsubscribe(self, channel: int) -> Subscription | None:
+        self._queues.pop(channel, None)
+        if sender := self._senders.pop(channel, None):
+            sender.cancel()
+        return self.subscriptions.pop(channel, None)
+
+    def start(self) -> None:
+        if not self.running:
+            self._started = monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for channel in list(self._senders):
+            self._senders.pop(channel).cancel()
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            if (key := self.key()) is None:
+                logger.warning("Not streaming, no Shodan API key is set")
+                return
+            try:
+                async with self.session.get(
+                    self.url,
+                    params={"key": key},
+                    timeout=ClientTimeout(total=None, sock_connect=10, sock_read=90),
+                ) as response:
+                    response.raise_for_status()
+                    attempt = 0
+                    await self.consume(self._count(response.content.iter_any()))
+            except (ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Shodan stream disconnected: %s", e)
+            self.reconnects += 1
+            delay = random.uniform(0, min(60.0, 2.0**attempt))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _count(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            self.bytes += len(chunk)
+            yield chunk
+
+    async def consume(self, chunks: AsyncIterator[bytes]) -> None:
+        """Route every banner of the stream to the channels subscribed to it"""
+        async for banner in iter_ndjson(chunks):
+            self.received += 1
+            for subscription in list(self.subscriptions.values()):
+                if subscription.matches(banner):
+                    self.matched += 1
+                    self._enqueue(subscription.channel, banner)
+
+    def _enqueue(self, channel: int, banner: dict) -> None:
+        if (queue := self._queues.get(channel)) is None:
+            return
+        if queue.full():
+            # Fresh banners are worth more than the ones the channel is behind on
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(banner)
+
+    async def _send(self, channel: int) -> None:
+        queue = self._queues[channel]
+        bucket = channel_bucket(channel)
+        while True:
+            batch = [await queue.get()]
+            deadline = monotonic() + self.flush
+            while len(batch) < self.batch and (left := deadline - monotonic()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=left))
+                except asyncio.TimeoutError:
+                    break
+            while delay := bucket.delay():
+                await asyncio.sleep(delay)
+            bucket.consume()
+            try:
+                await self.post(channel, batch)
+            except Exception as e:
+                logger.error("Posting %s banner(s) failed: %s", len(batch), e)
+            else:
+                self.posted += len(batch)
+                self.batches += 1
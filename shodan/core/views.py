@@ -1,6 +1,39 @@
 from __future__ import annotations
 
-from nextcord import ButtonStyle, Emoji, PartialEmoji, ui
+import asyncio
+import contextlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+from urllib.parse import quote_plus
+
+from aiohttp import ClientError
+from nextcord import (
+    ButtonStyle,
+    Colour,
+    Embed,
+    Emoji,
+    File,
+    HTTPException,
+    Interaction,
+    Member,
+    Message,
+    PartialEmoji,
+    SelectOption,
+    ui,
+)
+
+from shodan.utils.logging import get_logger
+from shodan.utils.util import Raise, code_block
+
+from .cves import CVE
+from .models import Match
+from .paginator import LazyEmbeds, PaginatorView
+from .ratelimit import Priority
+
+if TYPE_CHECKING:
+    from .api import ShodanClient
+
+logger = get_logger(__name__)
 
 
 class SingleLink(ui.View):
@@ -22,3 +55,407 @@ class Vulnerability(ui.Button):
             custom_id="search-vulnerabilities",
             row=1,
         )
+
+
+# Discord's limits on the fields of an embed and on all of its text
+EMBED_FIELDS = 25
+EMBED_FIELD_VALUE = 1024
+EMBED_TOTAL = 6000
+
+
+def facet_embed(query: str, total: int, facets: dict[str, list[dict]]) -> Embed:
+    """The total results and the facet breakdowns of a search
+
+    The facets share what's left of the embed's text limit, what one doesn't
+    use goes to the ones after it.
+    """
+    embed = Embed(
+        title=f"{total:,} result(s)",
+        color=Colour.brand_red(),
+        url=f"https://www.shodan.io/search?query={quote_plus(query)}",
+    ).set_footer(text=query[:2048])
+    fields = list(facets.items())[:EMBED_FIELDS]
+    left = EMBED_TOTAL - len(embed)
+    for index, (name, values) in enumerate(fields):
+        name = f"📊 {name.title()}"[:256]
+        share = left // (len(fields) - index) - len(name)
+        width = max((len(str(value["value"])) for value in values), default=0)
+        lines = [
+            f"{str(value['value']).ljust(width)}  {value['count']:,}"
+            for value in values
+        ]
+        value = code_block(
+            "\n".join(lines) or "No values",
+            "py",
+            limit=min(EMBED_FIELD_VALUE, share),
+        )
+        embed.add_field(name=name, value=value, inline=False)
+        left -= len(name) + len(value)
+    return embed
+
+
+class Facets(ui.Button):
+    def __init__(
+        self,
+    ):
+        super().__init__(
+            style=ButtonStyle.grey,
+            label="Facets",
+            emoji="📊",
+            custom_id="search-facets",
+            row=1,
+        )
+
+
+# Rendered vulnerability pages of the most recently viewed hosts
+_vuln_pages: OrderedDict[tuple, dict[str, Embed]] = OrderedDict()
+VULN_PAGE_HOSTS = 128
+
+
+def vuln_page(match: Match, cve: CVE) -> Embed:
+    """The page of one vulnerability of a host, rendered once per host"""
+    host = (match.ip_str, match.port, match.timestamp)
+    pages = _vuln_pages.get(host)
+    if pages is None:
+        pages = _vuln_pages[host] = {}
+        if len(_vuln_pages) > VULN_PAGE_HOSTS:
+            _vuln_pages.popitem(last=False)
+    else:
+        _vuln_pages.move_to_end(host)
+
+    if cve.id not in pages:
+        pages[cve.id] = (
+            Embed(
+                title=cve.id,
+                color=Colour.random(seed=cve.id),
+                description=cve.summary,
+                url=cve.reference,
+            )
+            .add_field(name="🎚 CVSS", value=code_block(cve.cvss))
+            .add_field(name="Verified", value=code_block(cve.id in match.verified))
+        )
+    return pages[cve.id]
+
+
+class VulnerabilityView(PaginatorView):
+    r"""Paginates the vulnerabilities of a match, worst CVSS score first
+
+    Parameters
+    ----------
+    interaction: :class:`Interaction`
+        The interaction whose response shows the vulnerabilities
+    match: :class:`Match`
+        The match to show the vulnerabilities of
+    """
+
+    THRESHOLDS = {
+        "All": 0.0,
+        "Medium and up (4+)": 4.0,
+        "High and up (7+)": 7.0,
+        "Critical (9+)": 9.0,
+    }
+
+    def __init__(self, interaction: Interaction, match: Match):
+        self.interaction = interaction
+        self.match = match
+        super().__init__(interaction.user, LazyEmbeds(len(match.vulns), self.render))
+        self.cvss = ui.Select(
+            custom_id="vulnerabilities-cvss",
+            placeholder="Filter by CVSS",
+            options=[
+                SelectOption(label=label, value=str(score), default=not score)
+                for label, score in self.THRESHOLDS.items()
+            ],
+            row=1,
+        )
+        self.cvss.callback = self.cvss_callback
+        self.add_item(self.cvss)
+
+    def render(self, index: int) -> Embed:
+        return vuln_page(self.match, self.match.vulns[index])
+
+    async def cvss_callback(self, inter: Interaction):
+        """Callback for the CVSS filter"""
+        minimum = float(self.cvss.values[0])
+        # The vulnerabilities are sorted worst first, so the filter is a prefix
+        amount = self.match.at_least(minimum) if minimum else len(self.match.vulns)
+        if not amount:
+            return await Raise(
+                inter, f"No vulnerabilities with a CVSS of {minimum:g} or higher"
+            ).error()
+        for option in self.cvss.options:
+            option.default = option.value == self.cvss.values[0]
+        self.embeds.length = amount
+        self.index = 0
+        await self.button_callback(inter)
+
+    async def _edit(self) -> Message | None:
+        for item in self.children:
+            if isinstance(item, ui.Button) and item.custom_id == "page_count":
+                item.label = f"Page {self.index + 1}/{len(self.embeds)}"
+
+        return await self.interaction.edit_original_message(
+            embed=self.embeds[self.index], view=self
+        )
+
+
+class SearchView(PaginatorView):
+    r"""Paginates the matches of a Shodan search
+
+    The next results page is prefetched in the background once the user gets
+    close to the last match, so paging past the end of a Shodan page flows
+    straight into the next one.
+
+    Parameters
+    ----------
+    user: :class:`Member`
+        The user to check for
+    client: :class:`ShodanClient`
+        The client to fetch more pages with
+    results: :class:`dict`
+        The first search response
+    query: :class:`str`
+        The search query
+    facets: Optional[:class:`str`]
+        The facets of the search
+    page: :class:`int`
+        The page ``results`` belongs to
+    guild: Optional[:class:`int`]
+        The guild the search was made in
+    budget: :class:`int`
+        How many extra pages may be fetched, each of them costs a query credit
+    minify: :class:`bool`
+        Whether the search was made without the full banners
+    """
+
+    PREFETCH_AHEAD = 5
+    GZIP_THRESHOLD = 256 * 1024
+    HTML_LIMIT = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        user: Member,
+        client: ShodanClient,
+        results: dict,
+        *,
+        query: str,
+        facets: str | None = None,
+        page: int = 1,
+        guild: int | None = None,
+        budget: int = 2,
+        minify: bool = False,
+    ):
+        self.matches: list[Match] = list(results["matches"])
+        self.total: int = results["total"]
+        self.summary: dict[str, list[dict]] = results.get("facets") or {}
+        super().__init__(user, LazyEmbeds(len(self.matches), self.render))
+        self.client = client
+        self.query = query
+        self.facets = facets
+        self.page = page
+        self.guild = guild
+        self.budget = budget
+        self.minify = minify
+        self._shown = 0
+        self._prefetch: asyncio.Task | None = None
+        self._uploads: dict[int, tuple[tuple[str, str], ...]] = {}
+        # The latest interaction of the user, uploads are follow-ups to it
+        self.interaction: Interaction | None = None
+        self.vulnerability = Vulnerability()
+        self.vulnerability.callback = self.vulnerability_callback
+        self.add_item(self.vulnerability)
+        if self.summary:
+            self.facet_button = Facets()
+            self.facet_button.callback = self.facets_callback
+            self.add_item(self.facet_button)
+
+    @property
+    def has_more(self) -> bool:
+        return self.budget > 0 and len(self.matches) < self.total
+
+    def render(self, index: int) -> Embed:
+        match = self.matches[index]
+        location = match.location
+        embed = (
+            Embed(
+                title=match.org,
+                color=Colour.random(seed=match.ip_str),
+                url=f"https://www.shodan.io/host/{match.ip_str}",
+                timestamp=match.timestamp,
+            )
+            .add_field(
+                name="🌐 IP-Address",
+                value=code_block(f"{match.ip_str}:{match.port}", "rb"),
+                inline=False,
+            )
+            .set_author(
+                name=f"Location: {location.city}, {location.country_name}",
+                url=f"https://www.google.com/maps/search/"
+                f"{location.latitude},{location.longitude}",
+                icon_url="https://cdn-icons-png.flaticon.com/512/2875/2875433.png",
+            )
+            .set_footer(text=f"Total Pages: {self.total}")
+        )
+
+        if match.hostnames:
+            embed.add_field(
+                name="📛 Hostnames",
+                value=code_block("\n".join(match.hostnames), "py"),
+                inline=False,
+            )
+        if uploads := self._uploads.get(index):
+            embed.add_field(
+                name="📎 Attachments",
+                value=" • ".join(f"[{name}]({url})" for name, url in uploads),
+                inline=False,
+            )
+        return embed
+
+    def prefetch(self) -> None:
+        """Fetch the next page in the background when the user nears the end"""
+        if self._prefetch and not self._prefetch.done():
+            return
+        if len(self.matches) - self.index > self.PREFETCH_AHEAD or not self.has_more:
+            return
+        self._prefetch = asyncio.create_task(self._fetch_next())
+
+    async def _fetch_next(self) -> None:
+        self.budget -= 1
+        try:
+            results = await self.client.search(
+                self.query,
+                self.facets,
+                self.page + 1,
+                minify=self.minify,
+                guild=self.guild,
+                user=self.user.id,
+                priority=Priority.BACKGROUND,
+            )
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning("Prefetching page %s failed: %s", self.page + 1, e)
+            self.budget = 0
+            return
+        if not results["matches"]:
+            self.budget = 0
+            return
+        self.page += 1
+        self.matches.extend(results["matches"])
+        self.embeds.length = len(self.matches)
+
+    def stream(self, fetches: list[asyncio.Task]) -> None:
+        """Append the pages of a deep search as they land
+
+        ``fetches`` are the concurrently running searches of the pages after
+        the current one, in page order. A page is appended once every page
+        before it has been, and the page count refreshes right away.
+        """
+        if self._prefetch and not self._prefetch.done():
+            self._prefetch.cancel()
+        self._prefetch = asyncio.create_task(self._append(fetches))
+
+    async def _append(self, fetches: list[asyncio.Task]) -> None:
+        try:
+            for fetch in fetches:
+                try:
+                    results = await fetch
+                except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.warning("Fetching page %s failed: %s", self.page + 1, e)
+                    return
+                if not results["matches"]:
+                    return
+                self.page += 1
+                self.matches.extend(results["matches"])
+                self.embeds.length = len(self.matches)
+                self.schedule_edit(self._edit)
+        finally:
+            for fetch in fetches:
+                fetch.cancel()
+
+    def files(self, match: Match) -> list[File] | None:
+        """Attachments of the match, streamed from the blob store"""
+        if self.minify:
+            return None
+        names = (
+            (("headers", "headers.txt"), ("html", "page.html"))
+            if match.is_http
+            else (("data", "data.txt"),)
+        )
+        files = []
+        blobs = self.client.blobs
+        for name, filename in names:
+            if (key := match.key(name)) is None or (path := blobs.path(key)) is None:
+                continue
+            # Big HTML bodies are truncated and uploaded gzip-compressed
+            if name == "html" and path.stat().st_size > self.GZIP_THRESHOLD:
+                key = blobs.gzip(key, limit=self.HTML_LIMIT)
+                path, filename = blobs.path(key) if key else None, f"{filename}.gz"
+            if path is not None:
+                files.append(File(path, filename=filename))
+        return files or None
+
+    async def button_callback(self, inter: Interaction | None):
+        if inter is not None:
+            self.interaction = inter
+            if not inter.response.is_done():
+                await inter.response.defer()
+        # Paging right from the last match continues into the next Shodan page
+        wrapped = self.index == 0 and self._shown == len(self.matches) - 1
+        if wrapped and self._prefetch and not self._prefetch.done():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.shield(self._prefetch), timeout=10)
+        if wrapped and len(self.matches) > self._shown + 1:
+            self.index = self._shown + 1
+        self._shown = self.index
+
+        self.prefetch()
+        await self.schedule_edit(self._edit)
+
+    async def _edit(self) -> Message | None:
+        index = self.index
+        match = self.matches[index]
+        for item in self.children:
+            item: ui.Button
+            if item.custom_id == "page_count":
+                item.label = f"Page {index + 1}/{len(self.embeds)}"
+            if item.custom_id == "search-vulnerabilities":
+                item.disabled = not match.vulns
+
+        # Files are uploaded on the first visit only, later visits link to them.
+        # They go to the user as an ephemeral follow-up, so nothing piles up in
+        # the channel or on the search message
+        if (
+            index not in self._uploads
+            and self.interaction is not None
+            and (files := self.files(match))
+        ):
+            try:
+                upload = await self.interaction.send(files=files, ephemeral=True)
+            except HTTPException as e:
+                logger.warning("Uploading the files of a match failed: %s", e)
+                self._uploads[index] = ()
+            else:
+                self._uploads[index] = tuple(
+                    (attachment.filename, attachment.url)
+                    for attachment in upload.attachments
+                )
+                self.embeds.invalidate(index)
+        return await self.msg.edit(embed=self.embeds[index], view=self)
+
+    async def facets_callback(self, interaction: Interaction):
+        """Callback for facets button"""
+        await interaction.send(
+            embed=facet_embed(self.query, self.total, self.summary), ephemeral=True
+        )
+
+    async def vulnerability_callback(self, interaction: Interaction):
+        """Callback for vulnerability button"""
+        await interaction.send(
+            embed=Embed(description="***⏳Searching...***"), ephemeral=True
+        )
+        vuln_view = VulnerabilityView(interaction, self.matches[self.index])
+        await vuln_view.button_callback(None)
+
+    async def on_timeout(self) -> None:
+        if self._prefetch:
+            self._prefetch.cancel()
+        await super().on_timeout()
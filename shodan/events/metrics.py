@@ -0,0 +1,28 @@
+from nextcord import ApplicationError, Interaction, utils
+from nextcord.ext.commands import Cog
+
+
+class CommandMetrics(Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def _record(self, interaction: Interaction, *, failed: bool) -> None:
+        command = interaction.application_command
+        if command is None:
+            return
+        seconds = (utils.utcnow() - interaction.created_at).total_seconds()
+        self.bot.metrics.command(command.qualified_name, seconds, failed=failed)
+
+    @Cog.listener()
+    async def on_application_command_completion(self, interaction: Interaction):
+        self._record(interaction, failed=False)
+
+    @Cog.listener()
+    async def on_application_command_error(
+        self, interaction: Interaction, _: ApplicationError
+    ):
+        self._record(interaction, failed=True)
+
+
+def setup(bot):
+    bot.add_cog(CommandMetrics(bot))
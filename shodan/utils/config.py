@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+from shodan.utils import logging
+
+__all__ = ["ConfigStore", "Config", "Namespace", "ASSETS_DIR"]
+
+logger = logging.get_logger(__name__)
+
+ASSETS_DIR = Path(__file__).parents[1] / "assets"
+# Separates the parts of a namespaced key, e.g. ``guilds.1234.prefix``
+SEPARATOR = "."
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    """Write ``text`` to a temporary file next to ``path`` and rename it over
+
+    A crash leaves either the old or the new file behind, never half of one.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Config:
+    r"""One JSON document of a :class:`ConfigStore`, held in memory
+
+    Keys may be namespaced with dots, ``set("guilds.1234.prefix", "!")``
+    creates the nested objects on the way. Every change schedules a flush,
+    changes made until it runs are written together.
+
+    Parameters
+    ----------
+    store: :class:`ConfigStore`
+        The store the document belongs to
+    name: :class:`str`
+        The file name, without ``.json``
+    data: Union[:class:`dict`, :class:`list`]
+        The document as loaded
+    """
+    __slots__ = ("store", "name", "data", "dirty")
+
+    def __init__(self, store: ConfigStore, name: str, data: dict | list):
+        self.store = store
+        self.name = name
+        self.data = data
+        self.dirty = False
+
+    @property
+    def path(self) -> Path:
+        return self.store.directory / f"{self.name}.json"
+
+    def _parent(self, key: str, create: bool) -> tuple[dict | None, str]:
+        *parents, last = str(key).split(SEPARATOR)
+        node = self.data
+        for part in parents:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if not create:
+                    return None, last
+                child = node[part] = {}
+            node = child
+        return node, last
+
+    def get(self, key: str, default: Any = None) -> Any:
+        node, last = self._parent(key, create=False)
+        return default if node is None else node.get(last, default)
+
+    def __getitem__(self, key: str) -> Any:
+        node, last = self._parent(key, create=False)
+        if node is None or last not in node:
+            raise KeyError(key)
+        return node[last]
+
+    def __contains__(self, key: str) -> bool:
+        node, last = self._parent(key, create=False)
+        return node is not None and last in node
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.data))
+
+    def set(self, key: str, value: Any) -> None:
+        node, last = self._parent(key, create=True)
+        node[last] = value
+        self.changed()
+
+    __setitem__ = set
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        node, last = self._parent(key, create=False)
+        if node is None or last not in node:
+            return default
+        value = node.pop(last)
+        self.changed()
+        return value
+
+    def update(self, data: dict[str, Any]) -> None:
+        for key, value in data.items():
+            node, last = self._parent(key, create=True)
+            node[last] = value
+        self.changed()
+
+    def replace(self, data: dict | list) -> None:
+        """Swap the whole document, e.g. for documents that are lists"""
+        self.data = data
+        self.changed()
+
+    def namespace(self, *parts: object) -> Namespace:
+        """A view of the keys below ``parts``, e.g. the settings of one guild"""
+        return Namespace(self, SEPARATOR.join(map(str, parts)))
+
+    def changed(self) -> None:
+        """Mark the document for the next flush"""
+        self.dirty = True
+        self.store.schedule(self)
+
+    def __repr__(self) -> str:
+        return f"<Config name={self.name!r} dirty={self.dirty}>"
+
+
+class Namespace:
+    r"""The keys of a :class:`Config` below a prefix
+
+    Parameters
+    ----------
+    config: :class:`Config`
+        The document the keys are in
+    prefix: :class:`str`
+        The dotted path every key is prefixed with
+    """
+    __slots__ = ("config", "prefix")
+
+    def __init__(self, config: Config, prefix: str):
+        self.config = config
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{SEPARATOR}{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.config.get(self._key(key), default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.config[self._key(key)]
+
+    def __contains__(self, key: str) -> bool:
+        return self._key(key) in self.config
+
+    def set(self, key: str, value: Any) -> None:
+        self.config.set(self._key(key), value)
+
+    __setitem__ = set
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        return self.config.pop(self._key(key), default)
+
+    def namespace(self, *parts: object) -> Namespace:
+        return self.config.namespace(self.prefix, *parts)
+
+
+class ConfigStore:
+    r"""The JSON documents under ``assets``, loaded once and served from memory
+
+    Changes are debounced: the first change to a document schedules a flush
+    ``delay`` seconds later and everything changed until then is written
+    with it. Documents are serialized on the event loop, so a flush always
+    writes a consistent snapshot, and written from a worker thread to a
+    temporary file that's renamed over the old one.
+
+    Parameters
+    ----------
+    directory: Union[:class:`str`, :class:`Path`]
+        Where the documents are stored
+    delay: :class:`float`
+        Seconds changes are collected before they're written
+    """
+
+    # Failed background writes of a document before waiting for its next change
+    RETRIES = 3
+
+    def __init__(self, directory: str | Path = ASSETS_DIR, *, delay: float = 1.0):
+        self.directory = Path(directory)
+        self.delay = delay
+        self.writes = 0
+        self._documents: dict[str, Config] = {}
+        self._flushes: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    def __getitem__(self, name: str) -> Config:
+        """The document ``name``, read from disk the first time only"""
+        if (config := self._documents.get(name)) is None:
+            config = self._documents[name] = Config(self, name, self._load(name))
+        return config
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._documents
+
+    def _load(self, name: str) -> dict | list:
+        try:
+            with open(self.directory / f"{name}.json", encoding="utf8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.error("%s.json isn't valid JSON, starting from scratch", name)
+            return {}
+
+    def schedule(self, config: Config) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing would run a flush later, so write right away
+            self._write(config)
+            return
+        task = self._flushes.get(config.name)
+        if task is None or task.done():
+            self._flushes[config.name] = loop.create_task(self._flush_later(config))
+
+    def _dump(self, config: Config) -> str:
+        config.dirty = False
+        return json.dumps(config.data, indent=4)
+
+    def _write(self, config: Config) -> None:
+        if config.dirty:
+            _atomic_write(config.path, self._dump(config))
+            self.writes += 1
+
+    async def _flush_later(self, config: Config) -> None:
+        await asyncio.sleep(self.delay)
+        await self._flush(config, attempts=self.RETRIES)
+
+    async def _flush(self, config: Config, *, attempts: int = 1) -> bool:
+        """Write ``config`` until it's clean, giving up after ``attempts`` failures"""
+        loop = asyncio.get_running_loop()
+        failures = 0
+        # Changes made during a write are picked up by the next round
+        while config.dirty:
+            # One write at a time, so an older snapshot can't be renamed last
+            async with self._lock:
+                text = self._dump(config)
+                try:
+                    await loop.run_in_executor(None, _atomic_write, config.path, text)
+                except OSError as e:
+                    config.dirty = True
+                    failures += 1
+                    logger.error("Writing %s.json failed: %s", config.name, e)
+                else:
+                    self.writes += 1
+                    continue
+            if failures >= attempts:
+                # The next change tries again
+                logger.error("Gave up writing %s.json for now", config.name)
+                return False
+            # Backing off outside the lock, other documents can still be written
+            await asyncio.sleep(self.delay * 2**failures)
+        return True
+
+    async def flush(self) -> bool:
+        """Write every changed document now, e.g. before shutting down
+
+        Each document gets one attempt, so a full disk or a read-only
+        directory can't hold up shutting down.
+        """
+        results = [
+            await self._flush(config) for config in list(self._documents.values())
+        ]
+        return all(results)
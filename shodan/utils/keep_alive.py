@@ -1,12 +1,18 @@
-from random import randint
+from __future__ import annotations
+
 from threading import Thread
+from typing import TYPE_CHECKING
 
-from flask import Flask
+from flask import Flask, Response
 
 from shodan.utils.logging import get_logger
 
+if TYPE_CHECKING:
+    from shodan.core.metrics import Metrics
+
 logger = get_logger(__name__)
 app = Flask("Shodan")
+metrics: Metrics | None = None
 
 
 @app.route("/")
@@ -14,15 +20,25 @@ def home():
     return "Online..."
 
 
-def run():
+@app.route("/metrics")
+def prometheus():
+    body = metrics.collect_threadsafe() if metrics is not None else None
+    if body is None:
+        return Response("Not ready\n", status=503, mimetype="text/plain")
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def run(port: int):
     from waitress import serve
 
     # set logger
-    logger.info("Starting webserver...")
-    serve(app, host="0.0.0.0", port=randint(2000, 9000), _quiet=True)
+    logger.info("Starting webserver on port %s...", port)
+    serve(app, host="0.0.0.0", port=port, _quiet=True)
 
 
-def webserver():
+def webserver(port: int = 8080, bot_metrics: Metrics | None = None):
     """Creates and starts new thread that runs the function run."""
-    t = Thread(target=run)
+    global metrics
+    metrics = bot_metrics
+    t = Thread(target=run, args=(port,))
     t.start()
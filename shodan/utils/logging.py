@@ -1,78 +1,132 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 
 from colorama import Fore, Style
 
+__all__ = ["BotLogger", "TerminalFormatter", "JsonFormatter", "get_logger"]
+
 
 class BotLogger(
     logging.Logger,
 ):
-    @staticmethod
-    def _debug_(*msgs):
-        return f'{Fore.CYAN}{" ".join(msgs)}{Style.RESET_ALL}'
-
-    @staticmethod
-    def _info_(*msgs):
-        return f'{Fore.LIGHTMAGENTA_EX}{" ".join(msgs)}{Style.RESET_ALL}'
-
-    @staticmethod
-    def _error_(*msgs):
-        return f'{Fore.RED}{" ".join(msgs)}{Style.RESET_ALL}'
-
-    def debug(self, msg, *args, **kwargs):
-        if self.isEnabledFor(logging.DEBUG):
-            self._log(logging.DEBUG, self._debug_(msg), args, **kwargs)
-
-    def info(self, msg, *args, **kwargs):
-        if self.isEnabledFor(logging.INFO):
-            self._log(logging.INFO, self._info_(msg), args, **kwargs)
-
-    def warning(self, msg, *args, **kwargs):
-        if self.isEnabledFor(logging.WARNING):
-            self._log(logging.WARNING, self._error_(msg), args, **kwargs)
-
-    def error(self, msg, *args, **kwargs):
-        if self.isEnabledFor(logging.ERROR):
-            self._log(logging.ERROR, self._error_(msg), args, **kwargs)
-
-    def critical(self, msg, *args, **kwargs):
-        if self.isEnabledFor(logging.CRITICAL):
-            self._log(logging.CRITICAL, self._error_(msg), args, **kwargs)
-
     def line(self, level="info"):
-        if level == "info":
-            level = logging.INFO
-        elif level == "debug":
-            level = logging.DEBUG
-        else:
-            level = logging.INFO
+        level = logging.DEBUG if level == "debug" else logging.INFO
         if self.isEnabledFor(level):
-            self._log(
-                level=logging.INFO,
-                msg=Fore.BLACK
-                + Style.BRIGHT
-                + "-------------------------"
-                + Style.RESET_ALL,
-                args=(),
-            )
+            self._log(level, "-" * 25, (), extra={"rule": True}, stacklevel=2)
+
+
+class TerminalFormatter(logging.Formatter):
+    r"""Formats records as text, colouring the message by its level
+
+    Parameters
+    ----------
+    colour: :class:`bool`
+        Whether to add colour escape codes at all
+    """
+
+    COLOURS = {
+        logging.DEBUG: Fore.CYAN,
+        logging.INFO: Fore.LIGHTMAGENTA_EX,
+        logging.WARNING: Fore.RED,
+        logging.ERROR: Fore.RED,
+        logging.CRITICAL: Fore.RED,
+    }
+    RULE = Fore.BLACK + Style.BRIGHT
+
+    def __init__(self, *, colour: bool = True):
+        super().__init__(
+            "%(asctime)s %(name)s[%(lineno)d] - %(levelname)s: %(message)s",
+            datefmt="%m/%d/%y %H:%M:%S",
+        )
+        self.colour = colour
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        if not self.colour:
+            return super().formatMessage(record)
+        message = record.message
+        if getattr(record, "rule", False):
+            colour = self.RULE
+        else:
+            colour = self.COLOURS.get(record.levelno, "")
+        record.message = f"{colour}{message}{Style.RESET_ALL}"
+        try:
+            return super().formatMessage(record)
+        finally:
+            record.message = message
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats every record as a single line of JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = record.stack_info
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve what may change or can't cross threads, formatting is left
+        # to the listener's thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _skip_rules(record: logging.LogRecord) -> bool:
+    return not getattr(record, "rule", False)
 
 
 logging.setLoggerClass(BotLogger)
-log_level = logging.INFO
-loggers = set()
+log_level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+if not isinstance(log_level, int):
+    log_level = logging.INFO
+# "text" for the terminal, "json" for JSON lines a log pipeline can ingest
+log_format = os.getenv("LOG_FORMAT", "text").lower()
+_plain = logging.Formatter()
 
 ch = logging.StreamHandler(stream=sys.stdout)
 ch.setLevel(log_level)
-formatter = logging.Formatter(
-    "%(asctime)s %(name)s[%(lineno)d] - %(levelname)s: %(message)s",
-    datefmt="%m/%d/%y %H:%M:%S",
-)
-ch.setFormatter(formatter)
+if log_format == "json":
+    ch.setFormatter(JsonFormatter())
+    ch.addFilter(_skip_rules)
+else:
+    ch.setFormatter(
+        TerminalFormatter(colour=sys.stdout.isatty() and "NO_COLOR" not in os.environ)
+    )
+
+# Loggers only put records on the queue, the listener's thread does the writing
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+handler = _QueueHandler(log_queue)
+listener = QueueListener(log_queue, ch, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
 
 
 def get_logger(name=None) -> BotLogger:
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    logger.addHandler(ch)
-    loggers.add(logger)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     return logger  # type: ignore
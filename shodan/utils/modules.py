@@ -11,7 +11,6 @@ from nextcord import Activity, ActivityType, Colour, Embed, Status
 from nextcord.ext.commands import ExtensionAlreadyLoaded
 
 from shodan.utils import logging
-from shodan.utils.json import read_json, write_json
 
 if TYPE_CHECKING:
     from shodan.core.bot import MainBot
@@ -32,6 +31,8 @@ def run_command(command: str) -> str:
 
 async def restart(bot: MainBot) -> None:
     logger.line()
+    # restart.py kills the process right away, nothing pending may be left
+    await bot.config.flush()
     await bot.change_presence(
         status=Status.idle,
         activity=Activity(type=ActivityType.watching, name="and Restarting...⚠️"),
@@ -47,9 +48,15 @@ async def close(bot: MainBot) -> None:
     """Close the bot gracefully"""
     import asyncio
 
+    # Write pending config changes before their flushes get cancelled
+    await bot.config.flush()
     # Cancel all tasks
     for task in asyncio.all_tasks():
         task.cancel("Bot is logging out")
+    bot.keys.close()
+    await bot.shodan.close()
+    bot.blobs.close()
+    await bot.loop.run_in_executor(None, bot.store.close)
     await bot.session.close()
     await bot.close()
     bot.loop.stop()
@@ -59,11 +66,12 @@ async def post_restart(bot: MainBot) -> None:
     import signal
 
     # Load restart configs from config.json
-    data = read_json("config")
-    if "restart_msg" in data:
-        msg = await bot.get_channel(int(data.pop("restart_channel"))).fetch_message(
-            int(data.pop("restart_msg"))
+    config = bot.config["config"]
+    if "restart.message" in config:
+        msg = await bot.get_channel(int(config["restart.channel"])).fetch_message(
+            int(config["restart.message"])
         )
+        config.pop("restart")
         create_task(
             msg.edit(
                 embed=Embed(
@@ -72,7 +80,6 @@ async def post_restart(bot: MainBot) -> None:
                 )
             )
         )
-        write_json(data, "config")
 
     # Add signal handlers
     for sig in (signal.SIGTERM, signal.SIGINT):
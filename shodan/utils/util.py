@@ -2,7 +2,7 @@ import asyncio
 import re
 from asyncio import TimeoutError
 from datetime import timedelta
-from typing import NamedTuple
+from typing import Iterable, NamedTuple
 
 from nextcord import (
     AllowedMentions,
@@ -15,7 +15,7 @@ from nextcord import (
 )
 from nextcord.ext.commands import Context
 
-from shodan.core.constants import ALPHABETS, NORMALIZE_CHARS
+from shodan.core.constants import maps_ascii, translate_table
 
 
 async def get_message(
@@ -57,44 +57,68 @@ async def get_message(
         return False
 
 
-def clean(message: Message | str) -> str:
-    if isinstance(message, Message):
-        text = message.content
-        for m in set(message.mentions):
-            text = text.replace(m.mention, m.display_name)
-    else:
-        text = message
-    unique = [
-        i for i in set(text) if i not in ALPHABETS[0]
-    ]  # handle special chars from other langs
-    for _char in unique:
-        try:
-            text = text.replace(_char, NORMALIZE_CHARS[_char])
-        except KeyError:
-            pass
-    text = re.sub(
-        re.compile(
-            r"[\U00003000\U0000205F\U0000202F\U0000200A\U00002000-\U00002009\U00001680\U000000A0\t]+"
-        ),
-        " ",
-        text,
-    )  # handle... interesting spaces
-    text = re.sub(
-        re.compile(r'([.\'"@?!a-z])\1{4,}', re.IGNORECASE), r"\1\1\1", text
-    )  # handle excessive repeats of punctuation, limited to 3
-    text = re.sub(
-        re.compile(r"\s(.+?)\1+\s", re.IGNORECASE), r" \1 ", text
-    )  # handle repeated words
-    text = re.sub(
-        re.compile(r'([\s!?@"\'])\1+'), r"\1", text
-    )  # handle excessive spaces or excessive punctuation
-    text = re.sub(
-        re.compile(r"\s([?.!\"](?:\s|$))"), r"\1", text
-    )  # handle spaces before punctuation but after text
+# Patterns of clean(), applied in this order
+_SPACES = re.compile(
+    r"[\U00003000\U0000205F\U0000202F\U0000200A\U00002000-\U00002009\U00001680\U000000A0\t]+"
+)  # handle... interesting spaces
+_REPEATED_CHARS = re.compile(
+    r'([.\'"@?!a-z])\1{4,}', re.IGNORECASE
+)  # handle excessive repeats of punctuation, limited to 3
+_REPEATED_WORDS = re.compile(r"\s(.+?)\1+\s", re.IGNORECASE)  # handle repeated words
+_REPEATED_PUNCTUATION = re.compile(
+    r'([\s!?@"\'])\1+'
+)  # handle excessive spaces or excessive punctuation
+_SPACED_PUNCTUATION = re.compile(
+    r"\s([?.!\"](?:\s|$))"
+)  # handle spaces before punctuation but after text
+# Joins a batch of texts for clean_many(), never part of a Discord message
+_SEPARATOR = "\x00"
+
+
+def _content(message: Message | str) -> str:
+    if not isinstance(message, Message):
+        return message
+    text = message.content
+    for m in set(message.mentions):
+        text = text.replace(m.mention, m.display_name)
+    return text
+
+
+def _normalize(text: str) -> str:
+    """Everything clean() does after replacing the special characters"""
+    text = _SPACES.sub(" ", text)
+    text = _REPEATED_CHARS.sub(r"\1\1\1", text)
+    text = _REPEATED_WORDS.sub(r" \1 ", text)
+    text = _REPEATED_PUNCTUATION.sub(r"\1", text)
+    text = _SPACED_PUNCTUATION.sub(r"\1", text)
     text = text.strip().replace("\n", "/n")  # handle newlines
     text = text.encode("ascii", "ignore").decode()  # remove all non-ascii
-    text = text.strip()  # strip the line
-    return text
+    return text.strip()
+
+
+def clean(message: Message | str) -> str:
+    """Normalize styled and accented characters, spacing and repeats to plain ASCII"""
+    text = _content(message)
+    # Plain ASCII text has nothing to translate unless the tables map ASCII
+    if text.isascii() and not maps_ascii():
+        return _normalize(text)
+    return _normalize(text.translate(translate_table()))
+
+
+def clean_many(messages: Iterable[Message | str]) -> list[str]:
+    """:func:`clean` a batch of messages, translating all of them in one pass"""
+    texts = [_content(message) for message in messages]
+    special = [i for i, text in enumerate(texts) if maps_ascii() or not text.isascii()]
+    if special and not any(_SEPARATOR in texts[i] for i in special):
+        joined = _SEPARATOR.join(texts[i] for i in special)
+        for i, text in zip(
+            special, joined.translate(translate_table()).split(_SEPARATOR)
+        ):
+            texts[i] = text
+    elif special:
+        for i in special:
+            texts[i] = texts[i].translate(translate_table())
+    return [_normalize(text) for text in texts]
 
 
 def clean_code(content):
@@ -104,10 +128,21 @@ def clean_code(content):
         return content
 
 
-def code_block(content, lang=""):
+def code_block(content, lang="", limit=None):
+    """Wrap ``content`` in a code block, cut at a line so it fits in ``limit``"""
+    if limit is not None and len(content) > (room := limit - len(lang) - 8):
+        cut = content[: room - 2]
+        if "\n" in cut:
+            cut = cut[: cut.rindex("\n")]
+        content = f"{cut}\n…"
     return f"```{lang}\n{content}\n```"
 
 
+def parse_port(value: str) -> int | None:
+    value = value.strip()
+    return int(value) if value.isdigit() and int(value) <= 0xFFFF else None
+
+
 class RaiseType(NamedTuple):
     emoji: str
     color: Colour
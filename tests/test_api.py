@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, web
+from aiohttp.test_utils import TestServer
+
+from shodan.core import api
+from shodan.core.blobs import BlobStore
+from shodan.core.cache import ResponseCache
+from shodan.core.keys import KeyPool
+
+
+def client_for(server: TestServer, rate: float) -> api.ShodanClient:
+    api.BASE_URL = str(server.make_url(""))
+    return api.ShodanClient(
+        KeyPool(rate=rate, shared=["secret"]),
+        cache=ResponseCache(),
+        blobs=BlobStore(),
+    )
+
+
+def serve(pages: list[int], *, failing: int | None = None) -> web.Application:
+    async def search(request: web.Request) -> web.Response:
+        page = int(request.query["page"])
+        pages.append(page)
+        if page == failing:
+            return web.json_response({"error": "Invalid query"}, status=400)
+        await asyncio.sleep(0.2)
+        return web.json_response({"total": 100, "matches": [], "facets": {}})
+
+    app = web.Application()
+    app.router.add_get("/shodan/host/search", search)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def restore_base_url():
+    base_url = api.BASE_URL
+    yield
+    api.BASE_URL = base_url
+
+
+def test_deep_pages_of_a_failed_search_are_never_fetched():
+    async def run():
+        pages = []
+        async with TestServer(serve(pages, failing=1)) as server:
+            client = client_for(server, rate=2)
+            first = asyncio.create_task(client.search("apache", page=1))
+            deep = [
+                asyncio.create_task(client.search("apache", page=page))
+                for page in range(2, 11)
+            ]
+            # What /search does when the first page fails
+            try:
+                with pytest.raises(ClientResponseError):
+                    await first
+            finally:
+                for task in deep:
+                    task.cancel()
+            await asyncio.gather(*deep, return_exceptions=True)
+            # Long enough for the rate limit to have let a few more through
+            await asyncio.sleep(1.5)
+            client.keys.close()
+            client.blobs.close()
+            await client.close()
+        return pages
+
+    assert asyncio.run(run()) == [1]
+
+
+def test_a_shared_call_outlives_one_of_its_callers():
+    async def run():
+        pages = []
+        async with TestServer(serve(pages)) as server:
+            client = client_for(server, rate=10)
+            leaving = asyncio.create_task(client.search("apache", page=2))
+            staying = asyncio.create_task(client.search("apache", page=2))
+            await asyncio.sleep(0.05)
+            leaving.cancel()
+            results = await staying
+            client.keys.close()
+            client.blobs.close()
+            await client.close()
+        return pages, results
+
+    pages, results = asyncio.run(run())
+    assert pages == [2]
+    assert results["total"] == 100
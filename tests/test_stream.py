@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from shodan.core.stream import StreamConsumer, Subscription, iter_ndjson
+
+BANNERS = [
+    {"ip_str": "1.1.1.1", "port": 80, "location": {"country_code": "US"}},
+    {"ip_str": "2.2.2.2", "port": 22, "location": {"country_code": "DE"}},
+    {"ip_str": "3.3.3.3", "port": 80, "org": "Example Org"},
+]
+
+
+def ndjson(banners: list[dict]) -> bytes:
+    return b"".join(json.dumps(banner).encode() + b"\n" for banner in banners)
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def collect(chunks) -> list[dict]:
+    return [banner async for banner in iter_ndjson(chunks)]
+
+
+def test_iter_ndjson_joins_lines_across_chunks():
+    data = ndjson(BANNERS)
+    for size in (1, 7, len(data)):
+        assert asyncio.run(collect(chunked(data, size))) == BANNERS
+
+
+def test_iter_ndjson_skips_keep_alives_and_malformed_lines():
+    data = b"\n" + ndjson(BANNERS[:1]) + b"\r\n{not json\n" + ndjson(BANNERS[1:])
+    assert asyncio.run(collect(chunked(data, 5))) == BANNERS
+
+
+def test_iter_ndjson_waits_for_the_end_of_a_line():
+    data = ndjson(BANNERS[:1]) + json.dumps(BANNERS[1]).encode()
+    assert asyncio.run(collect(chunked(data, 3))) == BANNERS[:1]
+
+
+def test_consume_drops_the_oldest_banner_of_a_full_queue():
+    async def run():
+        posted = []
+
+        async def post(channel, banners):
+            posted.extend(banners)
+
+        consumer = StreamConsumer(
+            None, "", key=lambda: None, post=post, queue_size=2, batch=1, flush=0
+        )
+        consumer.subscribe(Subscription(1, 10))
+        banners = [{"ip_str": str(i), "port": 80} for i in range(6)]
+        # The chunks are all there, so the reader never waits on the sender
+        await consumer.consume(chunked(ndjson(banners), 4))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        consumer.close()
+        return consumer, posted, banners
+
+    consumer, posted, banners = asyncio.run(run())
+    assert consumer.received == consumer.matched == 6
+    assert consumer.dropped == 4
+    assert posted == banners[-2:]
+
+
+def test_consumer_reads_a_local_stream_server():
+    async def run():
+        keys = []
+
+        async def banners(request: web.Request) -> web.StreamResponse:
+            keys.append(request.query.get("key"))
+            response = web.StreamResponse()
+            await response.prepare(request)
+            async for chunk in chunked(ndjson(BANNERS), 10):
+                await response.write(chunk)
+                await asyncio.sleep(0)
+            # Keep the connection open like the real stream does
+            await asyncio.sleep(3600)
+            return response
+
+        app = web.Application()
+        app.router.add_get("/shodan/banners", banners)
+        posted: dict[int, list[dict]] = {}
+        done = asyncio.Event()
+
+        async def post(channel, batch):
+            posted.setdefault(channel, []).extend(batch)
+            if sum(map(len, posted.values())) == 3:
+                done.set()
+
+        async with TestServer(app) as server, ClientSession() as session:
+            consumer = StreamConsumer(
+                session,
+                str(server.make_url("/shodan/banners")),
+                key=lambda: "secret",
+                post=post,
+                flush=0.05,
+            )
+            consumer.subscribe(Subscription(1, 10, ports=[80]))
+            consumer.subscribe(Subscription(1, 20, countries=["de"]))
+            consumer.start()
+            try:
+                await asyncio.wait_for(done.wait(), timeout=5)
+            finally:
+                consumer.close()
+        return consumer, keys, posted
+
+    consumer, keys, posted = asyncio.run(run())
+    assert keys == ["secret"]
+    assert consumer.received == 3
+    assert consumer.bytes == len(ndjson(BANNERS))
+    assert posted == {10: [BANNERS[0], BANNERS[2]], 20: [BANNERS[1]]}